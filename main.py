@@ -1,6 +1,24 @@
-from src.game import Game
-import asyncio
+from src.game import Game, SIM_RATE
+from src.pymgl.graphics_engine import QUALITY_PRESETS, DEFAULT_QUALITY
+import asyncio, argparse
 
 if __name__ == '__main__':
-    game = Game()
-    asyncio.run(game.run())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sim-rate', type=int, default=SIM_RATE, help='simulation steps per second')
+    parser.add_argument('--fps', type=int, default=0, help='frame rate cap, 0 leaves it uncapped')
+    parser.add_argument('--record', metavar='DIR', help='record the input of every run into DIR')
+    parser.add_argument('--replay', metavar='LOG', help='play back a recorded run')
+    parser.add_argument('--speed', type=int, default=1, help='recorded frames played per rendered frame')
+    parser.add_argument('--pbo', action='store_true', help='upload surfaces through pixel buffers')
+    parser.add_argument('--render-scale', type=float, default=1.0,
+                        help='share of the window resolution the game world is drawn at')
+    parser.add_argument('--auto-scale', action='store_true',
+                        help='lower the render scale when frames run over budget, up to --render-scale')
+    parser.add_argument('--quality', choices=list(QUALITY_PRESETS), default=DEFAULT_QUALITY,
+                        help='quality preset, it can also be changed from the pause menu')
+    args = parser.parse_args()
+
+    game = Game(sim_rate=args.sim_rate, fps_cap=args.fps, record_dir=args.record, playback=args.replay, playback_speed=args.speed,
+                use_pbo=args.pbo, render_scale=args.render_scale, auto_scale=args.auto_scale,
+                quality=args.quality)
+    asyncio.run(game.run())
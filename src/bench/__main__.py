@@ -0,0 +1,40 @@
+import os, sys, argparse
+
+# no window or audio device, this has to be set before pygame starts up
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from .cases import CASES
+from .runner import SCALES, TIME_BUDGET, THRESHOLD
+from .runner import run_benchmarks, save, load, compare, format_comparison
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m src.bench',
+                                     description='time the simulation and rendering hot paths')
+    parser.add_argument('cases', nargs='*', help=f'cases to run, all of them by default: {", ".join(CASES)}')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET, help='seconds spent timing each case and scale')
+    parser.add_argument('--out', help='write the results to this json file')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against a saved json baseline')
+    parser.add_argument('--current', help='compare this saved json instead of running the benchmarks')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown of the median counted as a regression, 0.1 is 10%%')
+    args = parser.parse_args()
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f'unknown cases: {", ".join(unknown)}')
+
+    if args.current:
+        report = load(args.current)
+    else:
+        report = run_benchmarks(args.cases or None, args.scales, args.seed, args.budget)
+    if args.out:
+        save(report, args.out)
+
+    if args.compare:
+        rows = compare(load(args.compare), report, args.threshold)
+        [print(format_comparison(row)) for row in rows]
+        regressions = sum(row['regression'] for row in rows)
+        print(f'{regressions} regressions in {len(rows)} comparisons')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,197 @@
+import pygame as pg
+import numpy as np
+import itertools, math
+
+from ..entities.bullet import BulletPool, LIFESPAN
+from ..entities.entity import Player, Enemies
+from ..entities.particles import Particles, ParticlePool, PARTICLE_BUDGET
+from ..pyfont.font import Font
+from ..pymgl.graphics_engine import GraphicsEngine
+from ..headless import HeadlessGame, leap_script
+from ..util.input_source import ScriptedInput
+
+# everything is spread over the play area, the same disc the game bounds the player to
+ARENA_RADIUS = 1000
+SIM_DT = 1 / 120
+# pixels of texture per item in the upload case, 100k items is about a 2500x2500 surface
+PIXELS_PER_ITEM = 64
+FONT_PATH = './src/pyfont/font.png'
+
+# each case takes (scale, rng, ctx) and returns (setup, run). setup() is called untimed before
+# every timed run(), so cases that consume their input can rebuild it
+
+def random_points(rng: 'np.random.Generator', count: int, radius: float = ARENA_RADIUS) -> 'np.ndarray[np.float32]':
+    # uniform over a disc
+    angle = rng.uniform(0, 2*math.pi, count)
+    dist = radius * np.sqrt(rng.uniform(0, 1, count))
+    return np.stack([dist * np.cos(angle), dist * np.sin(angle)], axis=-1).astype(np.float32)
+
+def fill_bullets(bullets: BulletPool, rng: 'np.random.Generator', count: int):
+    # staggered ages, so some of them expire on every update
+    bullets.add_bullets(random_points(rng, count), rng.uniform(0, 2*math.pi, count),
+                        rng.uniform(50, 150, count), -rng.uniform(0, LIFESPAN, count))
+
+def make_player() -> Player:
+    game = HeadlessGame(ScriptedInput(leap_script()))
+    player = Player((0, 0), lambda particle_group : None, game.sfx, game.sound_system)
+    player.rect.center = (0, 0)
+    player.update_shadow(0)
+    return player
+
+def bullets_update(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    bullets = BulletPool()
+
+    def setup():
+        bullets.clear()
+        fill_bullets(bullets, rng, scale)
+
+    def run():
+        bullets.update(SIM_DT)
+        bullets.get_positions()
+
+    return setup, run
+
+def check_hit(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    bullets = BulletPool()
+    fill_bullets(bullets, rng, scale)
+    player = make_player()
+
+    def setup():
+        # a fresh step, so the positions are recomputed like they are every frame
+        bullets.update(SIM_DT)
+
+    def run():
+        player.check_hit(bullets)
+
+    return setup, run
+
+def take_turn(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    enemies = Enemies(1, lambda *args : None, lambda particle_group : None, False)
+    enemies.count = 0
+    [enemies.spawn_enemy(pos) for pos in random_points(rng, scale)]
+    snapshot = [column[:scale].copy() for column in (enemies.pos, enemies.types,
+                                                     enemies.attack_timer, enemies.attack_interval)]
+    player = make_player()
+
+    def setup():
+        # kills remove enemies, put them all back
+        for column, saved in zip((enemies.pos, enemies.types, enemies.attack_timer, enemies.attack_interval),
+                                 snapshot):
+            column[:scale] = saved
+        enemies.count = scale
+        enemies.grid_dirty = True
+        player.pos = np.array([0, 0], dtype=np.float64)
+        player.rect.center = (0, 0)
+        player.update_shadow(float(rng.uniform(0, 2*math.pi)))
+
+    def run():
+        player.take_turn(enemies, ARENA_RADIUS)
+
+    return setup, run
+
+def get_particle_pool(scale: int) -> ParticlePool:
+    # the budget would otherwise cap every scale above it at PARTICLE_BUDGET particles
+    return ParticlePool(budget=max(scale, PARTICLE_BUDGET))
+
+def fill_particles(particles: ParticlePool, scale: int, rng: 'np.random.Generator'):
+    # a group emits 10 particles
+    particles.clear()
+    Particles(np.zeros(2), float(rng.uniform(0, 2*math.pi)), groups=max(scale // 10, 1)).emit(particles)
+
+def particles_update(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    particles = get_particle_pool(scale)
+
+    def setup():
+        fill_particles(particles, scale, rng)
+
+    def run():
+        particles.update(SIM_DT)
+
+    return setup, run
+
+def particles_render(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    particles = get_particle_pool(scale)
+    fill_particles(particles, scale, rng)
+    display = pg.Surface((960, 720))
+    display_offset = (480, 360)
+
+    def setup():
+        display.fill((0, 0, 0))
+
+    def run():
+        particles.render(display, display_offset)
+
+    return setup, run
+
+def particles_batch(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    res = (960, 720)
+    framebuffer = ctx.simple_framebuffer(res, components=4)
+    graphics_engine = GraphicsEngine(ctx, res)
+    particle_batch = graphics_engine.create_particle_batch()
+    particles = get_particle_pool(scale)
+    fill_particles(particles, scale, rng)
+    display_offset = (480, 360)
+
+    def setup():
+        framebuffer.use()
+        framebuffer.clear(0, 0, 0, 0)
+        ctx.finish()
+
+    def run():
+        particle_batch.begin()
+        particles.render_batch(particle_batch, display_offset)
+        particle_batch.render(framebuffer)
+        ctx.finish()
+
+    return setup, run
+
+def font_render(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    font = Font(pg.image.load(FONT_PATH).convert())
+    display = pg.Surface((960, 720))
+    # scale characters, in words of 7 wrapped to the display width
+    words = ['abcdefg'] * max(scale // 8, 1)
+    text = ' '.join(words)[:max(scale, 1)]
+
+    def setup():
+        display.fill((0, 0, 0))
+
+    def run():
+        font.render(display, text, 10, 10, (255, 255, 255), size=8, box_width=940)
+
+    return setup, run
+
+def upload_render(scale: int, rng: 'np.random.Generator', ctx) -> tuple[callable, callable]:
+    side = math.ceil(math.sqrt(scale * PIXELS_PER_ITEM))
+    res = (side, side)
+    framebuffer = ctx.simple_framebuffer(res, components=4)
+    framebuffer.use()
+    graphics_engine = GraphicsEngine(ctx, res)
+    surf = pg.Surface(res)
+    shades = itertools.count()
+
+    def setup():
+        # every pixel changes, so the whole surface is uploaded like it was before layers kept their texture
+        surf.fill((next(shades) % 256, 20, 20))
+        framebuffer.use()
+        # make sure nothing from the previous run is still in flight
+        ctx.finish()
+
+    def run():
+        graphics_engine.compositor.begin()
+        graphics_engine.add_surface_layer('display', surf, 0)
+        graphics_engine.compositor.render(framebuffer)
+        ctx.finish()
+
+    return setup, run
+
+# name -> (case, needs a gl context)
+CASES = {
+    'bullets_update': (bullets_update, False),
+    'check_hit': (check_hit, False),
+    'take_turn': (take_turn, False),
+    'particles_update': (particles_update, False),
+    'particles_render': (particles_render, False),
+    'particles_batch': (particles_batch, True),
+    'font_render': (font_render, False),
+    'upload_render': (upload_render, True),
+}
@@ -0,0 +1,133 @@
+import pygame as pg
+import moderngl as mgl
+import numpy as np
+import json, math, platform, statistics, time
+
+from .cases import CASES
+
+SCALES = (10, 100, 1000, 10000, 100000)
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+# stop repeating a case once it has been timed for this long
+TIME_BUDGET = 1.0
+# a case is a regression once its median is this much slower than the baseline
+THRESHOLD = 0.1
+
+def create_context() -> mgl.Context:
+    # no window, so a standalone context, egl is the one that works without a display server
+    for kwargs in ({}, {'backend': 'egl'}):
+        try:
+            ctx = mgl.create_standalone_context(**kwargs)
+        except Exception:
+            continue
+        ctx.enable(mgl.BLEND)
+        ctx.blend_func = (
+            mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA,
+        )
+        return ctx
+    return None
+
+def time_case(setup: callable, run: callable, min_repeats: int = MIN_REPEATS,
+              max_repeats: int = MAX_REPEATS, time_budget: float = TIME_BUDGET) -> list[float]:
+    samples = []
+    while len(samples) < max_repeats:
+        setup()
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= min_repeats and sum(samples) >= time_budget:
+            break
+    return samples
+
+def get_meta(ctx: mgl.Context) -> dict:
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pygame': pg.version.ver,
+        'moderngl': mgl.__version__,
+        'gl_renderer': ctx.info['GL_RENDERER'] if ctx else None,
+    }
+
+def run_benchmarks(names: list[str] = None, scales: tuple[int] = SCALES, seed: int = 0,
+                   time_budget: float = TIME_BUDGET, log: callable = print) -> dict:
+    pg.init()
+    # convert() in the font loader needs a display mode, the dummy driver is enough
+    pg.display.set_mode((1, 1))
+    ctx = create_context()
+
+    results = []
+    for name in names or CASES:
+        case, needs_gl = CASES[name]
+        for scale in scales:
+            result = {'case': name, 'scale': scale}
+            if needs_gl and ctx is None:
+                result['skipped'] = 'no gl context'
+            else:
+                # every case and scale sees the same random input, whatever ran before it
+                rng = np.random.default_rng(seed)
+                setup, run = case(scale, rng, ctx)
+                samples = time_case(setup, run, time_budget=time_budget)
+                result.update({
+                    'repeats': len(samples),
+                    'min': min(samples),
+                    'median': statistics.median(samples),
+                    'mean': statistics.fmean(samples),
+                })
+            results.append(result)
+            log(format_result(result))
+
+    meta = get_meta(ctx)
+    if ctx is not None:
+        ctx.release()
+    pg.quit()
+    return {
+        'meta': meta,
+        'results': results,
+    }
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f'{seconds:.3f} s'
+    if seconds >= 1e-3:
+        return f'{seconds*1e3:.3f} ms'
+    return f'{seconds*1e6:.1f} us'
+
+def format_result(result: dict) -> str:
+    if 'skipped' in result:
+        return f"{result['case']:<18}{result['scale']:>8}  skipped, {result['skipped']}"
+    return (f"{result['case']:<18}{result['scale']:>8}  median {format_time(result['median']):>12}"
+            f"  min {format_time(result['min']):>12}  ({result['repeats']} runs)")
+
+def save(report: dict, path: str):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD) -> list[dict]:
+    # ratio of current to baseline median for every case and scale in both reports
+    baseline_results = {(result['case'], result['scale']): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        base = baseline_results.get((result['case'], result['scale']))
+        if base is None or 'median' not in base or 'median' not in result:
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else math.inf
+        rows.append({
+            'case': result['case'],
+            'scale': result['scale'],
+            'baseline': base['median'],
+            'current': result['median'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
+
+def format_comparison(row: dict) -> str:
+    flag = 'REGRESSION' if row['regression'] else ''
+    return (f"{row['case']:<18}{row['scale']:>8}  {format_time(row['baseline']):>12} -> "
+            f"{format_time(row['current']):>12}  x{row['ratio']:.2f}  {flag}")
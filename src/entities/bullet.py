@@ -1,50 +1,174 @@
 import numpy as np
-import pygame as pg
-import math
+
+from .spatial_hash import SpatialHash
 
 LIFESPAN = 5
 BULLET_SIZE = 5
+POOL_CAPACITY = 256
+POOL_GROWTH = 2
+# how far bullets may drift from where the grid last saw them before it is rebuilt
+GRID_SLACK = 8
+
+COLUMNS = ('spawn_pos', 'dir', 'angle', 'move_speed', 'active_time', 'expire_time')
+
+class BulletPool:
+    def __init__(self, capacity: int = POOL_CAPACITY):
+        # every bullet moves in a straight line, so it is stored as its trajectory and
+        # evaluated against the simulation clock only when a position is asked for
+        self.clock = 0.0
+        self.prev_clock = 0.0
+
+        # structure of arrays, live rows are [self.head, self.end) sorted by expire_time
+        self.head = 0
+        self.end = 0
+        self.spawn_pos = np.zeros((capacity, 2), dtype=np.float32)
+        # cached unit velocity, so positions do not need trig
+        self.dir = np.zeros((capacity, 2), dtype=np.float32)
+        self.angle = np.zeros(capacity, dtype=np.float32)
+        self.move_speed = np.zeros(capacity, dtype=np.float32)
+        self.active_time = np.zeros(capacity, dtype=np.float64)
+        self.expire_time = np.zeros(capacity, dtype=np.float64)
+        # upper bound on how far any bullet moves per unit of clock
+        self.max_speed = 0.0
+        # furthest any bullet moved in the last update
+        self.max_step = 0.0
+
+        self.positions = None
+        self.prev_positions = None
+
+        self.grid = SpatialHash()
+        self.grid_clock = 0.0
+        self.grid_dirty = True
+
+    def __len__(self) -> int:
+        return self.end - self.head
+
+    def columns(self) -> list['np.ndarray']:
+        return [getattr(self, name) for name in COLUMNS]
+
+    def reserve(self, capacity: int):
+        # room for capacity live rows starting at self.head
+        size = self.spawn_pos.shape[0]
+        if self.head + capacity <= size:
+            return
+        count = len(self)
+        # slide live rows back to the front, and grow once that would leave the pool over half full
+        new_size = size if capacity <= size // 2 else max(capacity, size * POOL_GROWTH)
+        for name in COLUMNS:
+            old = getattr(self, name)
+            if new_size == size:
+                old[:count] = old[self.head:self.end]
+            else:
+                new = np.zeros((new_size,) + old.shape[1:], dtype=old.dtype)
+                new[:count] = old[self.head:self.end]
+                setattr(self, name, new)
+        self.head, self.end = 0, count
+
+    def changed(self):
+        self.positions = None
+        self.prev_positions = None
+        self.grid_dirty = True
+
+    def add_bullets(self, pos: 'np.ndarray[np.float32]', angle: 'np.ndarray[np.float32]',
+                    move_speed: 'np.ndarray[np.float32]', delay: 'np.ndarray[np.float32]' = 0):
+        angle = np.atleast_1d(np.asarray(angle, dtype=np.float32))
+        num_bullets = angle.shape[0]
+        if num_bullets == 0:
+            return
+        move_speed = np.broadcast_to(np.asarray(move_speed, dtype=np.float32), num_bullets)
+        active_time = self.clock + np.broadcast_to(np.asarray(delay, dtype=np.float64), num_bullets)
+        new_rows = [
+            np.reshape(pos, (-1, 2)),
+            np.stack([np.cos(angle), np.sin(angle)], axis=-1),
+            angle,
+            move_speed,
+            active_time,
+            active_time + LIFESPAN,
+        ]
+        order = np.argsort(new_rows[-1], kind='stable')
+        new_rows = [rows[order] for rows in new_rows]
+        self.reserve(len(self) + num_bullets)
+
+        # a new volley usually outlives everything already live, then this is a plain append.
+        # otherwise only the tail that expires later than the volley has to be merged
+        first_expire = new_rows[-1][0]
+        start = self.head + int(np.searchsorted(self.expire_time[self.head:self.end], first_expire, side='right'))
+        new_end = self.end + num_bullets
+        if start == self.end:
+            for column, rows in zip(self.columns(), new_rows):
+                column[start:new_end] = rows
+        else:
+            merged = [np.concatenate([column[start:self.end], rows]) for column, rows in zip(self.columns(), new_rows)]
+            order = np.argsort(merged[-1], kind='stable')
+            for column, rows in zip(self.columns(), merged):
+                column[start:new_end] = rows[order]
+        self.end = new_end
+
+        self.max_speed = max(self.max_speed, float(move_speed.max()))
+        self.changed()
+
+    def clear(self):
+        self.head = self.end = 0
+        self.max_speed = 0.0
+        self.changed()
 
-def draw_circle(radius: float, color: tuple[int, int, int]) -> pg.Surface:
-    surf = pg.Surface((2*radius, 2*radius))
-    pg.draw.circle(surf, color, (radius, radius), radius)
-    surf.set_colorkey((0, 0, 0))
-    return surf
-
-class Bullet():
-    def __init__(self, pos: 'np.ndarray[np.float32]', angle: float, move_speed: float, 
-                 bullet_type: str, color=(200, 0, 0), delay: float=0):
-        self.pos = pos
-        self.color = color
-        self.angle = angle
-        self.move_speed = move_speed
-        self.bullet_type = bullet_type
-        self.lifetime = 0
-        self.delay = delay
-
-        self.surf = draw_circle(BULLET_SIZE, (255, 255, 255))
-        # pg.draw.circle(self.surf, (255, 255, 255), (BULLET_SIZE, BULLET_SIZE), BULLET_SIZE, 2)
-        # self.surf = pg.Surface((2*BULLET_SIZE, 2*BULLET_SIZE))
-        # self.surf.fill((255, 255, 255))
-        self.rect = self.surf.get_rect()
-        self.glow = draw_circle(3*BULLET_SIZE, (25, 10, 10))
-        
     def update(self, dt: float):
-        if self.delay > 0:
-            self.delay -= dt
+        self.prev_clock = self.clock
+        self.clock += dt
+        self.max_step = self.max_speed * dt
+        self.positions = None
+        self.prev_positions = None
+
+        # the queue is sorted by expiry, so dead bullets are always at the head
+        expired = int(np.searchsorted(self.expire_time[self.head:self.end], self.clock, side='right'))
+        if expired:
+            self.head += expired
+            self.grid_dirty = True
+            if self.head == self.end:
+                self.clear()
+
+    def positions_at(self, clock: float) -> 'np.ndarray[np.float32]':
+        live = slice(self.head, self.end)
+        elapsed = np.maximum(clock - self.active_time[live], 0).astype(np.float32)
+        return self.spawn_pos[live] + self.dir[live] * (self.move_speed[live] * elapsed)[:, None]
+
+    def get_positions(self) -> 'np.ndarray[np.float32]':
+        if self.positions is None:
+            self.positions = self.positions_at(self.clock)
+        return self.positions
+
+    def get_prev_positions(self) -> 'np.ndarray[np.float32]':
+        # positions before the last update, for swept collision
+        if self.prev_positions is None:
+            self.prev_positions = self.positions_at(self.prev_clock)
+        return self.prev_positions
+
+    def get_angles(self) -> 'np.ndarray[np.float32]':
+        return self.angle[self.head:self.end]
+
+    def get_grid(self) -> tuple[SpatialHash, float]:
+        # the grid is kept while bullets stay within GRID_SLACK of where it saw them,
+        # queries have to be widened by the returned drift
+        drift = self.max_speed * (self.clock - self.grid_clock)
+        if self.grid_dirty or drift > GRID_SLACK:
+            self.grid.build(self.get_positions())
+            self.grid_clock = self.clock
+            self.grid_dirty = False
+            drift = 0.0
+        return self.grid, drift
+
+    def render_batch(self, sprite_batch, display_offset: tuple[float, float],
+                     visible: 'np.ndarray[np.int64]' = None, alpha: float = 1, glow: bool = True):
+        if alpha < 1:
+            # interpolate between the last two updates
+            drawpos = self.positions_at(self.prev_clock + alpha * (self.clock - self.prev_clock))
         else:
-            self.pos = self.pos + self.move_speed * np.array([math.cos(self.angle), math.sin(self.angle)]) * dt
-            self.lifetime += dt
-        self.rect.centerx = self.pos[0]
-        self.rect.centery = self.pos[1]
-    
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        drawpos = np.array(self.rect.topleft) + np.array(display_offset) 
-        display.blit(self.surf, drawpos)
-        drawpos = drawpos - 2*np.array([BULLET_SIZE, BULLET_SIZE])
-        display.blit(self.glow, drawpos, special_flags=pg.BLEND_RGB_ADD)
-
-    def is_dead(self) -> bool:
-        if self.lifetime >= LIFESPAN:
-            return True
-        return False
\ No newline at end of file
+            drawpos = self.get_positions()
+        if visible is not None:
+            drawpos = drawpos[visible]
+        if drawpos.shape[0] == 0:
+            return
+        drawpos = drawpos + np.array(display_offset, dtype=np.float32)
+        sprite_batch.add(drawpos, BULLET_SIZE, (255, 255, 255))
+        if glow:
+            sprite_batch.add(drawpos, 3*BULLET_SIZE, (25, 10, 10), additive=True)
@@ -1,11 +1,16 @@
 import pygame as pg
 import numpy as np
-import math, random
+import math
 
-from .bullet import Bullet
+from .bullet import BulletPool
+from .spatial_hash import SpatialHash, gather_ranges
 from .particles import Particles, DeathParticles
+from ..util.sprite_cache import get_circle
+from ..util.rng import get_stream
 
 ENTITY_SIZE = 20
+# enemies further than this from the leap path cannot touch the player's swept rect
+KILL_REACH = 3*ENTITY_SIZE
 FULL_NUM_BULLETS = 20
 SHOTGUN_NUM_BULLETS = 5
 SPIRAL_NUM_BULLETS = 10
@@ -13,66 +18,93 @@ MULTI_NUM_BULLETS = 5
 WAVE_NUM_BULLETS = 10
 CIRCLE_NUM_BULLETS = 10
 
-def wave(pos: 'np.ndarray[np.float32]', angle: float) -> list[Bullet]:
-    wave_amplitude = 20
-    norm_angle = angle + math.pi/2
-    bullets = []
-    for i in range(WAVE_NUM_BULLETS):
-        offset = wave_amplitude * math.sin(2*math.pi*i/10)
-        start_pos = pos + offset * np.array([math.cos(norm_angle), math.sin(norm_angle)])
-        bullets.append(Bullet(start_pos, angle, 150, 'normal', delay=i*0.05))
-    return bullets
-
-def circle(pos: 'np.ndarray[np.float32]', angle: float) -> list[Bullet]:
-    radius = 30
-    bullets = []
-    for i in range(CIRCLE_NUM_BULLETS):
-        circle_angle = 2*math.pi*i/10 + angle
-        offset = radius * np.array([math.cos(circle_angle), math.sin(circle_angle)])
-        start_pos = pos + radius * np.array([math.cos(angle), math.sin(angle)]) + offset
-        bullets.append(Bullet(start_pos, angle, 125, 'normal'))
-    return bullets
+WAVE_AMPLITUDE = 20
+CIRCLE_RADIUS = 30
+
+def get_pattern(angles: 'np.ndarray[np.float32]', move_speed: float, delays: float=0,
+                offsets: 'np.ndarray[np.float32]'=None) -> dict[str, 'np.ndarray[np.float32]']:
+    # a volley in the enemy's frame, aimed along +x. offsets are spawn offsets from the enemy,
+    # angles are relative to the aim angle
+    angles = np.atleast_1d(np.asarray(angles, dtype=np.float32))
+    num_bullets = angles.shape[0]
+    return {
+        'offsets': np.zeros((num_bullets, 2), dtype=np.float32) if offsets is None else np.asarray(offsets, dtype=np.float32),
+        'angles': angles,
+        'move_speed': np.full(num_bullets, move_speed, dtype=np.float32),
+        'delays': np.broadcast_to(np.asarray(delays, dtype=np.float32), num_bullets).copy(),
+    }
+
+def wave() -> dict[str, 'np.ndarray[np.float32]']:
+    i = np.arange(WAVE_NUM_BULLETS)
+    # sideways offset along the normal of the aim direction
+    offsets = np.stack([np.zeros(WAVE_NUM_BULLETS), WAVE_AMPLITUDE * np.sin(2*math.pi*i/10)], axis=-1)
+    return get_pattern(np.zeros(WAVE_NUM_BULLETS), 150, delays=i*0.05, offsets=offsets)
+
+def circle() -> dict[str, 'np.ndarray[np.float32]']:
+    circle_angle = 2*math.pi*np.arange(CIRCLE_NUM_BULLETS)/10
+    # a ring of bullets centered one radius in front of the enemy
+    offsets = CIRCLE_RADIUS * np.stack([1 + np.cos(circle_angle), np.sin(circle_angle)], axis=-1)
+    return get_pattern(np.zeros(CIRCLE_NUM_BULLETS), 125, offsets=offsets)
 
 ENEMY_TYPES = {
     'shotgun': {
         'attack_interval': 1,
-        'bullets': lambda pos, angle : [Bullet(pos, angle + (SHOTGUN_NUM_BULLETS//2-i) * math.pi/12, 150, 'normal') 
-                                        for i in range(SHOTGUN_NUM_BULLETS)]
+        'bullets': get_pattern((SHOTGUN_NUM_BULLETS//2 - np.arange(SHOTGUN_NUM_BULLETS)) * math.pi/12, 150),
     },
     'full' : {
         'attack_interval': 1.5,
-        'bullets': lambda pos, angle : [Bullet(pos, angle + i * 2*math.pi/FULL_NUM_BULLETS, 100, 'normal') 
-                                        for i in range(FULL_NUM_BULLETS)],
+        'bullets': get_pattern(np.arange(FULL_NUM_BULLETS) * 2*math.pi/FULL_NUM_BULLETS, 100),
     },
     'single' : {
         'attack_interval': 0.5,
-        'bullets': lambda pos, angle : [Bullet(pos, angle, 200, 'normal')],
+        'bullets': get_pattern(0, 200),
     },
     'multi': {
         'attack_interval': 0.75,
-        'bullets': lambda pos, angle : [Bullet(pos, angle, 175, 'normal', delay=0.05*i) 
-                                        for i in range(MULTI_NUM_BULLETS)]
+        'bullets': get_pattern(np.zeros(MULTI_NUM_BULLETS), 175, delays=0.05*np.arange(MULTI_NUM_BULLETS)),
     },
     'spiral' : {
         'attack_interval': 1.25,
-        'bullets': lambda pos, angle : [Bullet(pos, angle + i * 2*math.pi/SPIRAL_NUM_BULLETS, 150, 'normal', delay=0.05*i) 
-                                        for i in range(SPIRAL_NUM_BULLETS)],
+        'bullets': get_pattern(np.arange(SPIRAL_NUM_BULLETS) * 2*math.pi/SPIRAL_NUM_BULLETS, 150,
+                               delays=0.05*np.arange(SPIRAL_NUM_BULLETS)),
     },
     'wave': {
         'attack_interval': 1,
-        'bullets': wave,
+        'bullets': wave(),
     },
     'circle': {
         'attack_interval': 1,
-        'bullets': circle,
+        'bullets': circle(),
     }
 }
 
-def draw_circle(radius: int, color: tuple[int, int, int]):
-    surf = pg.Surface((2*radius, 2*radius))
-    pg.draw.circle(surf, color, (radius, radius), radius)
-    surf.set_colorkey((0, 0, 0))
-    return surf
+def compile_patterns(enemy_types: dict) -> dict[str, 'np.ndarray']:
+    # every pattern concatenated into flat tables, indexed by type through starts/counts
+    patterns = [enemy_types[name]['bullets'] for name in enemy_types]
+    counts = np.array([pattern['angles'].shape[0] for pattern in patterns], dtype=np.int64)
+    compiled = {
+        key: np.concatenate([pattern[key] for pattern in patterns])
+        for key in ('offsets', 'angles', 'move_speed', 'delays')
+    }
+    compiled['counts'] = counts
+    compiled['starts'] = np.cumsum(counts) - counts
+    return compiled
+
+PATTERNS = compile_patterns(ENEMY_TYPES)
+
+def fire_patterns(types: 'np.ndarray[np.int32]', pos: 'np.ndarray[np.float32]', aim: 'np.ndarray[np.float32]') -> tuple:
+    # one volley per (type, pos, aim) row, all rotated and translated in one go
+    counts = PATTERNS['counts'][types]
+    rows = gather_ranges(PATTERNS['starts'][types], counts)
+    owner = np.repeat(np.arange(types.shape[0]), counts)
+    cos, sin = np.cos(aim)[owner], np.sin(aim)[owner]
+    offsets = PATTERNS['offsets'][rows]
+    start_pos = np.asarray(pos)[owner] + np.stack([
+        offsets[:, 0]*cos - offsets[:, 1]*sin,
+        offsets[:, 0]*sin + offsets[:, 1]*cos,
+    ], axis=-1)
+    angles = aim[owner] + PATTERNS['angles'][rows]
+    return start_pos, angles, PATTERNS['move_speed'][rows], PATTERNS['delays'][rows]
 
 def swept_aabb_coll(movement: tuple[float, float], r1: pg.Rect, r2: pg.Rect):
     if movement[0] > 0:
@@ -110,6 +142,82 @@ def swept_aabb_coll(movement: tuple[float, float], r1: pg.Rect, r2: pg.Rect):
         return False
     return True
 
+def swept_aabb_colls(movement: tuple[float, float], r1: pg.Rect, rects: 'np.ndarray[np.int64]') -> 'np.ndarray[np.bool_]':
+    # swept_aabb_coll against every row of rects (left, top, right, bottom) at once
+    left, top, right, bottom = rects.T
+    if movement[0] > 0:
+        dx_enter = left - r1.right
+        dx_exit = right - r1.left
+    else:
+        dx_enter = right - r1.left
+        dx_exit = left - r1.right
+
+    if movement[1] > 0:
+        dy_enter = top - r1.bottom
+        dy_exit = bottom - r1.top
+    else:
+        dy_enter = bottom - r1.top
+        dy_exit = top - r1.bottom
+
+    if movement[0] == 0:
+        tx_enter = np.full(rects.shape[0], -np.inf)
+        tx_exit = np.full(rects.shape[0], np.inf)
+    else:
+        tx_enter = dx_enter/movement[0]
+        tx_exit = dx_exit/movement[0]
+
+    if movement[1] == 0:
+        ty_enter = np.full(rects.shape[0], -np.inf)
+        ty_exit = np.full(rects.shape[0], np.inf)
+    else:
+        ty_enter = dy_enter/movement[1]
+        ty_exit = dy_exit/movement[1]
+
+    enter_time = np.maximum(tx_enter, ty_enter)
+    exit_time = np.minimum(tx_exit, ty_exit)
+
+    return ~((enter_time > exit_time) | (enter_time > 1) | (enter_time < 0))
+
+def first_hit(center: 'np.ndarray[np.float32]', radius: float, pos: 'np.ndarray[np.float32]',
+              prev_pos: 'np.ndarray[np.float32]' = None) -> int:
+    # index of the first point that comes within radius of center, -1 if none do.
+    # with prev_pos the points are swept along prev_pos -> pos and the earliest contact wins
+    if pos.shape[0] == 0:
+        return -1
+    start = pos if prev_pos is None else prev_pos
+
+    # broadphase, bail out if the circle misses the bounds of every path
+    lo = np.minimum(start.min(axis=0), pos.min(axis=0)) - radius
+    hi = np.maximum(start.max(axis=0), pos.max(axis=0)) + radius
+    if np.any(center < lo) or np.any(center > hi):
+        return -1
+
+    # per point bounds
+    near = np.all((np.minimum(start, pos) - radius <= center) & (center <= np.maximum(start, pos) + radius), axis=1)
+    candidates = np.flatnonzero(near)
+    if candidates.size == 0:
+        return -1
+
+    rel = start[candidates] - center
+    if prev_pos is None:
+        hits = candidates[np.einsum('ij,ij->i', rel, rel) <= radius**2]
+        return int(hits[0]) if hits.size else -1
+
+    # solve |rel + t * move|^2 = radius^2 for the entry time t in [0, 1]
+    move = pos[candidates] - start[candidates]
+    a = np.einsum('ij,ij->i', move, move)
+    b = np.einsum('ij,ij->i', rel, move)
+    c = np.einsum('ij,ij->i', rel, rel) - radius**2
+    disc = b*b - a*c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_enter = np.where(a > 0, (-b - np.sqrt(np.maximum(disc, 0))) / a, np.inf)
+    t_enter = np.where(c <= 0, 0, t_enter)
+    hit = (c <= 0) | ((disc >= 0) & (t_enter >= 0) & (t_enter <= 1))
+    if not np.any(hit):
+        return -1
+    t_enter = np.where(hit, t_enter, np.inf)
+    return int(candidates[np.argmin(t_enter)])
+
 class Entity:
     def __init__(self, pos: tuple[float, float], color: tuple[int, int, int] = (0, 0, 255),
                  move_speed = 150):
@@ -124,9 +232,8 @@ class Entity:
 
     def update(self, dt: float): ...
 
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        drawpos = np.array(self.rect.topleft) + np.array(display_offset)
-        display.blit(self.surf, drawpos)
+    def render_batch(self, sprite_batch, display_offset: tuple[float, float]):
+        sprite_batch.add(self.pos + np.array(display_offset), ENTITY_SIZE, self.color)
     
 class Player(Entity):
     def __init__(self, pos: tuple[float, float], add_particle_group: callable,
@@ -135,7 +242,7 @@ class Player(Entity):
         self.bullet_time = True
         self.shadow_pos = self.pos
 
-        self.surf = draw_circle(ENTITY_SIZE, self.color)
+        self.surf = get_circle(ENTITY_SIZE, self.color)
         self.rect = self.surf.get_rect()
 
         self.add_particle_group = add_particle_group
@@ -153,68 +260,87 @@ class Player(Entity):
         shadow_offset = self.shadow_pos - self.pos
         angle = math.atan2(shadow_offset[1], shadow_offset[0])
 
-        kills = []
-        for i in range(len(enemies.enemies)):
-            enemy_offset = enemies.enemies[i].pos - self.pos
-            if enemy_offset @ enemy_offset >= (self.move_speed + 2*ENTITY_SIZE)**2:
-                continue
-            if swept_aabb_coll(shadow_offset, self.rect, enemies.enemies[i].rect):
-                kills.append(i)
-
-
+        # the rect is otherwise only placed when rendering, which a headless run never does
+        self.rect.centerx = self.pos[0]
+        self.rect.centery = self.pos[1]
+        candidates = enemies.get_grid().query_segment(self.pos, self.shadow_pos, KILL_REACH)
+        enemy_offset = enemies.get_positions()[candidates] - self.pos
+        near = np.einsum('ij,ij->i', enemy_offset, enemy_offset) < (self.move_speed + 2*ENTITY_SIZE)**2
+        candidates = candidates[near]
+        hit = swept_aabb_colls(shadow_offset, self.rect, enemies.get_rects()[candidates])
+
+        kills = np.zeros(len(enemies), dtype=bool)
+        kills[candidates[hit]] = True
+        num_kills = int(np.count_nonzero(kills))
         enemies.kill(kills)
         
         # move
         self.pos = self.pos + shadow_offset
         self.add_particle_group(Particles(self.pos, angle))
 
-        if not kills:
+        if not num_kills:
             self.bullet_time = False
 
         self.sound_system.queue_new_sound(self.sfx['turn'])
         
-        return len(kills)
+        return num_kills
 
     def update_shadow(self, angle: float):
         self.shadow_pos = self.pos + self.move_speed * np.array([math.cos(angle), math.sin(angle)])
 
-    def check_hit(self, bullets: list):
-        for bullet in bullets:
-            rvec = self.pos - bullet.pos
-            sqr_dist = rvec @ rvec
-            if sqr_dist <= ENTITY_SIZE**2:
-                self.add_particle_group(Particles(self.pos, bullet.angle, groups=1))
-                self.sound_system.queue_new_sound(self.sfx['hit'])
-                self.death_particles.update_anchor(self.pos)
-                return True
+    def check_hit(self, bullets: BulletPool, swept: bool = True, use_grid: bool = True):
+        if use_grid:
+            # only bullets that could have reached the player this frame
+            grid, drift = bullets.get_grid()
+            reach = ENTITY_SIZE + (bullets.max_step if swept else 0) + drift
+            candidates = np.sort(grid.query_radius(self.pos, reach))
+        else:
+            candidates = slice(0, len(bullets))
+        prev_pos = bullets.get_prev_positions()[candidates] if swept else None
+        hit = first_hit(self.pos, ENTITY_SIZE, bullets.get_positions()[candidates], prev_pos)
+        if hit != -1:
+            angle = float(bullets.get_angles()[candidates][hit])
+            self.add_particle_group(Particles(self.pos, angle, groups=1))
+            self.sound_system.queue_new_sound(self.sfx['hit'])
+            self.death_particles.update_anchor(self.pos)
+            return True
         
         return False
 
     def update(self, dt: float): ...
 
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
+    def render_batch(self, sprite_batch, display_offset: tuple[float, float]):
         self.rect.centerx = self.pos[0]
         self.rect.centery = self.pos[1]
-        super().render(display, display_offset)
+        super().render_batch(sprite_batch, display_offset)
         # draw shadow
-        shadow_drawpos = self.shadow_pos + np.array(display_offset) - np.array([ENTITY_SIZE, ENTITY_SIZE])
-        display.blit(self.surf, shadow_drawpos)
-
-        # death particles
-        self.death_particles.render(display, display_offset)
+        sprite_batch.add(self.shadow_pos + np.array(display_offset), ENTITY_SIZE, self.color)
 
-        # print(f'player: {self.pos}, anchor: {self.death_particles.pos}')
+    def death(self, dt: float):
+        self.death_particles.advance(dt)
+        self.add_particle_group(self.death_particles)
 
-    def death(self):
-        self.death_particles.spawn_particles()
+ENEMY_TYPE_NAMES = list(ENEMY_TYPES)
+ATTACK_INTERVALS = np.array([ENEMY_TYPES[name]['attack_interval'] for name in ENEMY_TYPE_NAMES], dtype=np.float32)
+ENEMY_COLOR = (255, 0, 0)
+ENEMY_MOVE_SPEED = 150
+ENEMY_CAPACITY = 64
 
 class Enemies:
     def __init__(self, num_enemies: int, add_bullets: callable, add_particle_group: callable,
                  in_tutorial: bool):
-        self.enemies = []
+        # structure of arrays, only the first self.count rows are live
+        self.count = 0
+        self.pos = np.zeros((ENEMY_CAPACITY, 2), dtype=np.float64)
+        self.types = np.zeros(ENEMY_CAPACITY, dtype=np.int32)
+        self.attack_timer = np.zeros(ENEMY_CAPACITY, dtype=np.float32)
+        self.attack_interval = np.zeros(ENEMY_CAPACITY, dtype=np.float32)
+
         self.num_enemies = num_enemies
         self.add_bullets = add_bullets
         self.add_particle_group = add_particle_group
+        self.grid = SpatialHash()
+        self.grid_dirty = True
         if in_tutorial:
             self.test_config()
         else:
@@ -222,6 +348,9 @@ class Enemies:
         
         self.spawn_rate = 1
         self.spawn_time = 0
+
+    def __len__(self) -> int:
+        return self.count
     
     def starting_config(self):
         angle = 2*math.pi/self.num_enemies
@@ -230,75 +359,92 @@ class Enemies:
     def test_config(self):
         [self.spawn_enemy((100+150*i)*np.array([1, 0])) for i in range(5)]
 
-    def spawn_enemy(self, pos: tuple[float, float]):
-        self.enemies.append(Enemy(pos, self.add_bullets, self.add_particle_group, enemy_type=random.choice(list(ENEMY_TYPES))))
-        # self.enemies.append(Enemy(pos, self.add_bullets, self.add_particle_group, enemy_type='full'))
+    def get_grid(self) -> SpatialHash:
+        # enemies only move when spawned, killed or taking turns, so rebuild lazily
+        if self.grid_dirty:
+            self.grid.build(self.get_positions())
+            self.grid_dirty = False
+        return self.grid
+
+    def get_positions(self) -> 'np.ndarray[np.float64]':
+        return self.pos[:self.count]
+
+    def get_rects(self) -> 'np.ndarray[np.int64]':
+        # same placement as setting pg.Rect.center, which truncates towards zero
+        center = np.trunc(self.pos[:self.count]).astype(np.int64)
+        return np.hstack([center - ENTITY_SIZE, center + ENTITY_SIZE])
+
+    def reserve(self, capacity: int):
+        if capacity <= self.pos.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self.pos.shape[0])
+        for name in ('pos', 'types', 'attack_timer', 'attack_interval'):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn_enemy(self, pos: tuple[float, float], enemy_type: str = None):
+        if enemy_type is None:
+            enemy_type = ENEMY_TYPE_NAMES[get_stream('enemies').integers(len(ENEMY_TYPE_NAMES))]
+        # enemy_type = 'full'
+        self.reserve(self.count + 1)
+        i = self.count
+        self.pos[i] = pos
+        self.types[i] = ENEMY_TYPE_NAMES.index(enemy_type)
+        self.attack_timer[i] = 0
+        self.attack_interval[i] = ENEMY_TYPES[enemy_type]['attack_interval']
+        self.count += 1
+        self.grid_dirty = True
 
     def randomly_spawn(self):
-        self.enemies.append(Enemy((random.uniform(-250, 250), random.uniform(-250, 250)),
-                                  self.add_bullets, self.add_particle_group, 
-                                  enemy_type=random.choice(list(ENEMY_TYPES))))
+        self.spawn_enemy(get_stream('enemies').uniform(-250, 250, 2))
 
     def update(self, dt: float, ppos: tuple[float, float]):
-        [enemy.update(dt, ppos) for enemy in self.enemies]
+        n = self.count
+        timers = self.attack_timer[:n]
+        timers += dt
+        firing = np.flatnonzero(timers > self.attack_interval[:n])
+        if firing.size:
+            # aim every enemy that is due at once and emit all of their volleys together
+            rel = np.asarray(ppos) - self.pos[firing]
+            angles = np.arctan2(rel[:, 1], rel[:, 0])
+            self.add_bullets(*fire_patterns(self.types[firing], self.pos[firing], angles))
+            timers[firing] = 0
 
         self.spawn_time += dt
         if self.spawn_time >= self.spawn_rate:
             self.randomly_spawn()
             self.spawn_time = 0
-    
-    # def update_bullets(self, dt: float, slow_down: bool):
-    #     if slow_down:
-    #         dt /= 10
-    #     [bullet.update(dt) for enemy in self.enemies for bullet in enemy.bullets]
-    #     [enemy.check_bullet_lifetime() for enemy in self.enemies]
 
     def take_turns(self):
-        [enemy.take_turn() for enemy in self.enemies]
-    
-    def kill(self, kills):
-        [self.enemies.pop(kills[kill_index]) for kill_index in range(len(kills)-1, -1, -1)]
-
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        [enemy.render(display, display_offset) for enemy in self.enemies]
-        # [bullet.render(display, display_offset)  for enemy in self.enemies for bullet in enemy.bullets]
-
-class Enemy(Entity):
-    def __init__(self, pos: tuple[float, float], add_bullets: callable, 
-                 add_particle_group: callable, enemy_type: str = 'spiral'):
-        super().__init__(pos, color=(255, 0, 0))
-        self.enemy_type = enemy_type
-        self.attack_timer = 0
-        self.attack_interval = ENEMY_TYPES[self.enemy_type]['attack_interval']
-        self.attack_count = 0
-        self.bullets : list[Bullet] = []
-        self.add_bullets = add_bullets
-        self.add_particle_group = add_particle_group
-
-        self.surf = draw_circle(ENTITY_SIZE, self.color)
-        self.glow = draw_circle(2*ENTITY_SIZE, (100, 50, 50))
-        self.rect = self.surf.get_rect()
-    
-    def resolve_action(self, ppos: tuple[float, float]):
-        rel = np.array(ppos) - self.pos
-        angle = math.atan2(rel[1], rel[0])
-        new_bullets = ENEMY_TYPES[self.enemy_type]['bullets'](self.pos, angle)
-        [self.add_bullets(new_bullet) for new_bullet in new_bullets]
-        self.attack_count -= 1
-
-    def take_turn(self):
-        angle = random.uniform(0, 2*math.pi)
-        self.pos = self.pos + self.move_speed * np.array([math.cos(angle), math.sin(angle)])
-
-    def update(self, dt: float, ppos: tuple[float, float]):
-        self.attack_timer += dt
-        if self.attack_timer > self.attack_interval:
-            self.resolve_action(ppos)
-            self.attack_timer = 0
+        n = self.count
+        angles = get_stream('enemies').uniform(0, 2*math.pi, n)
+        self.pos[:n, 0] += ENEMY_MOVE_SPEED * np.cos(angles)
+        self.pos[:n, 1] += ENEMY_MOVE_SPEED * np.sin(angles)
+        self.grid_dirty = True
     
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        self.rect.centerx = self.pos[0]
-        self.rect.centery = self.pos[1]
-        super().render(display, display_offset)
-
-        
+    def kill(self, kills: 'np.ndarray[np.bool_]'):
+        # kills is a mask over the live enemies, swap the last enemy into each hole
+        killed = np.flatnonzero(kills)
+        if killed.size == 0:
+            return
+        for i in killed[::-1]:
+            last = self.count - 1
+            if i != last:
+                self.pos[i] = self.pos[last]
+                self.types[i] = self.types[last]
+                self.attack_timer[i] = self.attack_timer[last]
+                self.attack_interval[i] = self.attack_interval[last]
+            self.count -= 1
+        self.grid_dirty = True
+
+    def render_batch(self, sprite_batch, display_offset: tuple[float, float],
+                     view: tuple['np.ndarray', 'np.ndarray'] = None):
+        if view is None:
+            positions = self.pos[:self.count]
+        else:
+            positions = self.pos[np.sort(self.get_grid().query_rect(*view))]
+        if positions.shape[0] == 0:
+            return
+        sprite_batch.add(positions + np.array(display_offset), ENTITY_SIZE, ENEMY_COLOR)
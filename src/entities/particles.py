@@ -1,181 +1,243 @@
 import pygame as pg
 import numpy as np
-import random, math
+import math
+
+from ..util.rng import get_stream
+from ..util.sprite_cache import get_glow, quantize_radius
 
 NUM_PARTICLES = 5
 LIFETIME = 0.5
 MAJOR_AXIS = 20
 MINOR_AXIS = 5
-RADIUS = 15
-
-def draw_circle(radius: float, color: tuple[int, int, int]) -> pg.Surface:
-    surf = pg.Surface((2*radius, 2*radius))
-    pg.draw.circle(surf, color, (radius, radius), radius)
-    surf.set_colorkey((0, 0, 0))
-    return surf
-
-def get_spark(minor_axis: float, major_axis: float, pos: 'np.ndarray[np.float32]', 
-              angle: float) -> list['np.ndarray[np.float32]']:
-    norm_angle = angle + math.pi/2
-    points = [
-        pos - major_axis*3/4 * np.array([math.cos(angle), math.sin(angle)]),
-        pos - minor_axis/2 * np.array([math.cos(norm_angle), math.sin(norm_angle)]),
-        pos + major_axis/4 * np.array([math.cos(angle), math.sin(angle)]),
-        pos + minor_axis/2 * np.array([math.cos(norm_angle), math.sin(norm_angle)]),
-    ]
-    return points
+
+PARTICLE_CAPACITY = 256
+PARTICLE_GROWTH = 2
+# most particles alive in one pool, past it the oldest make room for new ones
+PARTICLE_BUDGET = 4096
+# death sparks per second
+DEATH_RATE = 120
+
+# behaviors, every particle moves in a straight line on top of its behavior
+BALLISTIC = 0
+GRAVITY = 1
+GRAVITY_ACCEL = np.array([0, 400], dtype=np.float32)
+
+COLUMNS = ('pos', 'vel', 'lifetime', 'kind', 'minor_scale', 'major_scale', 'glow')
+
+def get_sparks(minor_axis: 'np.ndarray[np.float32]', major_axis: 'np.ndarray[np.float32]',
+               pos: 'np.ndarray[np.float32]', direction: 'np.ndarray[np.float32]') -> 'np.ndarray[np.float32]':
+    # (n, 4, 2) corners of a kite along each direction
+    norm = np.stack([-direction[:, 1], direction[:, 0]], axis=-1)
+    return np.stack([
+        pos - (major_axis*3/4)[:, None] * direction,
+        pos - (minor_axis/2)[:, None] * norm,
+        pos + (major_axis/4)[:, None] * direction,
+        pos + (minor_axis/2)[:, None] * norm,
+    ], axis=1)
+
+class ParticlePool:
+    def __init__(self, capacity: int = PARTICLE_CAPACITY, budget: int = PARTICLE_BUDGET, density: float = 1.0):
+        # structure of arrays, only the first self.count rows are live, oldest first
+        self.budget = budget
+        # share of their sparks the emitters make, the quality presets lower it
+        self.density = density
+        capacity = min(capacity, budget)
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.lifetime = np.zeros(capacity, dtype=np.float32)
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        # spark size per second of lifetime left, relative to MINOR_AXIS and MAJOR_AXIS
+        self.minor_scale = np.zeros(capacity, dtype=np.float32)
+        self.major_scale = np.zeros(capacity, dtype=np.float32)
+        self.glow = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def reserve(self, capacity: int):
+        size = self.pos.shape[0]
+        if capacity <= size:
+            return
+        # never more rows than the budget, so a long session cannot grow the pool
+        new_size = min(max(capacity, size * PARTICLE_GROWTH), self.budget)
+        for name in COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros((new_size,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, pos: 'np.ndarray[np.float32]', vel: 'np.ndarray[np.float32]',
+            lifetime: 'np.ndarray[np.float32]', kind: int = BALLISTIC, minor_scale: float = 3,
+            major_scale: float = 3, glow: bool = True):
+        # a whole burst at once, scalars are shared by every particle in it
+        pos = np.reshape(pos, (-1, 2))
+        num_particles = pos.shape[0]
+        if num_particles == 0:
+            return
+        vel = np.broadcast_to(vel, pos.shape)
+        lifetime = np.broadcast_to(lifetime, num_particles)
+        if num_particles > self.budget:
+            # a burst bigger than the whole budget keeps its last particles
+            pos, vel, lifetime = pos[-self.budget:], vel[-self.budget:], lifetime[-self.budget:]
+            num_particles = self.budget
+        self.drop_oldest(self.count + num_particles - self.budget)
+        self.reserve(self.count + num_particles)
+        new = slice(self.count, self.count + num_particles)
+        self.pos[new] = pos
+        self.vel[new] = vel
+        self.lifetime[new] = lifetime
+        self.kind[new] = kind
+        self.minor_scale[new] = minor_scale
+        self.major_scale[new] = major_scale
+        self.glow[new] = glow
+        self.count += num_particles
+
+    def drop_oldest(self, num_particles: int):
+        # rows stay in the order they were added, so the oldest are at the front
+        if num_particles <= 0:
+            return
+        num_particles = min(num_particles, self.count)
+        for name in COLUMNS:
+            column = getattr(self, name)
+            column[:self.count - num_particles] = column[num_particles:self.count]
+        self.count -= num_particles
+
+    def clear(self):
+        self.count = 0
+
+    def update(self, dt: float):
+        n = self.count
+        if n == 0:
+            return
+        kind = self.kind[:n]
+        vel = self.vel[:n]
+        vel[kind == GRAVITY] += GRAVITY_ACCEL * dt
+        self.pos[:n] += vel * dt
+        lifetime = self.lifetime[:n]
+        lifetime -= dt
+
+        alive = lifetime > 0
+        num_alive = int(np.count_nonzero(alive))
+        if num_alive < n:
+            for name in COLUMNS:
+                column = getattr(self, name)
+                column[:num_alive] = column[:n][alive]
+            self.count = num_alive
+
+    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
+        n = self.count
+        if n == 0:
+            return
+        drawpos = self.pos[:n] + np.array(display_offset, dtype=np.float32)
+        lifetime = self.lifetime[:n]
+        minor_axis = MINOR_AXIS * lifetime * self.minor_scale[:n]
+        major_axis = MAJOR_AXIS * lifetime * self.major_scale[:n]
+        speed = np.maximum(np.linalg.norm(self.vel[:n], axis=1, keepdims=True), 1e-6)
+        sparks = get_sparks(minor_axis, major_axis, drawpos, self.vel[:n] / speed)
+        for spark in sparks.tolist():
+            pg.draw.polygon(display, (255, 255, 255), spark)
+
+        glowing = np.flatnonzero(self.glow[:n])
+        radii = [quantize_radius(radius) for radius in major_axis[glowing].tolist()]
+        glow_topleft = drawpos[glowing] - np.array(radii, dtype=np.float32)[:, None]
+        display.blits([(get_glow(radius, (10, 10, 25)), topleft, None, pg.BLEND_RGB_ADD)
+                       for radius, topleft in zip(radii, glow_topleft.tolist())], doreturn=False)
+
+    def render_batch(self, particle_batch, display_offset: tuple[float, float]):
+        # the shader builds the sparks and glows, only the columns are uploaded
+        n = self.count
+        if n == 0:
+            return
+        vel = self.vel[:n]
+        size = np.stack([MINOR_AXIS * self.minor_scale[:n], MAJOR_AXIS * self.major_scale[:n]], axis=-1)
+        particle_batch.add(self.pos[:n] + np.array(display_offset, dtype=np.float32),
+                           np.arctan2(vel[:, 1], vel[:, 0]), self.lifetime[:n], size, self.glow[:n])
 
 class Particles:
+    # a burst of sparks flying back from angle
     def __init__(self, anchor: 'np.ndarray[np.float32]', angle: float, groups: int=1, glow: bool=True):
         self.anchor = anchor
-        # a particle will be stored:
-        # [pos: np.array, vel: np.array, color: tuple, time: float]
-        self.particles = []
         self.groups = groups
         self.glow = glow
         self.angle = angle
-        self.spawn_particles()
-
-    def spawn_particles(self):
-        for i in range(NUM_PARTICLES*self.groups):
-            angle_range = math.pi
-            angle = self.angle + math.pi + random.uniform(0, angle_range) - angle_range/2
-            pos = self.anchor + MAJOR_AXIS*2/3 * np.array([math.cos(angle), math.sin(angle)])
-            vel = random.uniform(50, 75) * np.array([math.cos(angle), math.sin(angle)])
-            lifetime = LIFETIME
-            self.particles.append([
-                pos,
-                vel,
-                (255, 255, 255),
-                lifetime
-            ])
-        for i in range(NUM_PARTICLES*self.groups):
-            angle_range = math.pi/4
-            angle = self.angle + math.pi + random.uniform(0, angle_range) - angle_range/2
-            pos = self.anchor + MAJOR_AXIS*3/4 * np.array([math.cos(angle), math.sin(angle)])
-            vel = random.uniform(200, 225) * np.array([math.cos(angle), math.sin(angle)])
-            lifetime = LIFETIME * random.uniform(0.75, 1.25)
-            self.particles.append([
-                pos,
-                vel,
-                (255, 255, 255),
-                lifetime
-            ])
-    
-    def update(self, dt: float):
-        for i in range(len(self.particles)-1, -1, -1):
-            self.particles[i][0] = self.particles[i][0] + self.particles[i][1] * dt
-            self.particles[i][3] -= dt
-            if self.particles[i][3] <= 0:
-                self.particles.pop(i)
-        
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        for particle in self.particles:
-            drawpos = particle[0] + np.array(display_offset)
-            minor_axis = MINOR_AXIS * particle[3] * 3
-            major_axis = MAJOR_AXIS * particle[3] * 3
-            angle = math.atan2(particle[1][1], particle[1][0])
-            spark_points = get_spark(minor_axis, major_axis, 
-                                     drawpos, angle)
-            pg.draw.polygon(display, (255, 255, 255), spark_points)
-
-            if self.glow:
-                glow = draw_circle(major_axis, (10, 10, 25))
-                drawpos = drawpos - np.array([major_axis, major_axis])
-                display.blit(glow, drawpos, special_flags=pg.BLEND_RGB_ADD)
+
+    def emit(self, pool: ParticlePool):
+        # the whole burst is drawn in one call, columns are
+        # [wide angle, wide speed, narrow angle, narrow speed, narrow lifetime]
+        num_particles = max(round(NUM_PARTICLES*self.groups*pool.density), 1)
+        wide_range = math.pi
+        narrow_range = math.pi/4
+        draws = get_stream('particles').uniform(
+            [-wide_range/2, 50, -narrow_range/2, 200, 0.75],
+            [wide_range/2, 75, narrow_range/2, 225, 1.25],
+            (num_particles, 5))
+        base_angle = self.angle + math.pi
+
+        # a wide slow spray, then a narrow fast one
+        angle = base_angle + np.concatenate([draws[:, 0], draws[:, 2]])
+        direction = np.stack([np.cos(angle), np.sin(angle)], axis=-1)
+        reach = np.repeat([MAJOR_AXIS*2/3, MAJOR_AXIS*3/4], num_particles)
+        speed = np.concatenate([draws[:, 1], draws[:, 3]])
+        lifetime = np.concatenate([np.full(num_particles, LIFETIME), LIFETIME * draws[:, 4]])
+        pool.add(self.anchor + reach[:, None] * direction, speed[:, None] * direction, lifetime,
+                 glow=self.glow)
 
 class DeathParticles:
-    def __init__(self, anchor: 'np.ndarray[np.float32]', color: tuple[int, int, int]):
+    # sparks thrown up from the anchor at rate per second, however often it is emitted
+    def __init__(self, anchor: 'np.ndarray[np.float32]', color: tuple[int, int, int], rate: float = DEATH_RATE):
         self.anchor = anchor
-        # a particle will be stored:
-        # [pos: np.array, vel: np.array, time: float]
-        self.particles = []
         self.color = color
+        self.rate = rate
+        # sparks owed since the last emit, the fraction carries over
+        self.pending = 0
 
     def update_anchor(self, anchor: 'np.ndarray[np.float32]'):
         self.anchor = anchor
 
-    def spawn_particles(self):
+    def advance(self, dt: float):
+        self.pending += self.rate * dt
+
+    def emit(self, pool: ParticlePool):
+        num_particles = int(self.pending * pool.density)
+        if num_particles == 0:
+            return
+        self.pending -= num_particles / pool.density
         angle_range = 2*math.pi
-        angle = 3*math.pi/2 + random.uniform(0, angle_range) - angle_range/2
-        pos = np.array(self.anchor) + MAJOR_AXIS * np.array([math.cos(angle), math.sin(angle)])
-        vel = random.uniform(200, 250) * np.array([math.cos(angle), math.sin(angle)])
-        lifetime = LIFETIME * random.uniform(0.5, 1)
-        self.particles.append([
-            pos,
-            vel,
-            lifetime
-        ])
-    
-    def update(self, dt: float):
-        for i in range(len(self.particles)-1, -1, -1):
-            self.particles[i][0] = self.particles[i][0] + self.particles[i][1] * dt
-            self.particles[i][2] -= dt
-            if self.particles[i][2] <= 0:
-                self.particles.pop(i)
-    
-    def render(self, display: pg.Surface, display_offset: tuple[float, float]):
-        for particle in self.particles:
-            drawpos = particle[0] + np.array(display_offset)
-            minor_axis = MINOR_AXIS * particle[2] * 5
-            major_axis = MAJOR_AXIS * particle[2] * 7
-            angle = math.atan2(particle[1][1], particle[1][0])
-            spark_points = get_spark(minor_axis, major_axis, 
-                                     drawpos, angle)
-            pg.draw.polygon(display, (255, 255, 255), spark_points)
-            
-            glow = draw_circle(major_axis, (10, 10, 25))
-            drawpos = drawpos - np.array([major_axis, major_axis])
-            display.blit(glow, drawpos, special_flags=pg.BLEND_RGB_ADD)
+        # [angle, speed, lifetime] for every spark owed in one draw
+        draws = get_stream('particles').uniform([-angle_range/2, 200, 0.5], [angle_range/2, 250, 1],
+                                                (num_particles, 3))
+        angle = 3*math.pi/2 + draws[:, 0]
+        direction = np.stack([np.cos(angle), np.sin(angle)], axis=-1)
+        pool.add(np.array(self.anchor) + MAJOR_AXIS * direction, draws[:, 1:2] * direction,
+                 LIFETIME * draws[:, 2], minor_scale=5, major_scale=7)
 
 class CursorParticles:
+    # sparks falling off the mouse, with a pool of their own
     def __init__(self, groups: int=1):
-        self.particles = []
+        self.pool = ParticlePool()
         self.groups = groups
         self.spawn_rate = 0.1
         self.spawn_time = 0
-        # a particle will be stored:
-        # [pos: np.array, vel: np.array, color: tuple, time: float]
-    
-    def spawn_particles(self):
-        for i in range(NUM_PARTICLES*self.groups):
-            angle_range = 2*math.pi
-            angle = 3*math.pi/2 + random.uniform(0, angle_range) - angle_range/2
-            anchor = pg.mouse.get_pos()
-            pos = np.array(anchor) + MAJOR_AXIS * np.array([math.cos(angle), math.sin(angle)])
-            vel = random.uniform(200, 250) * np.array([math.cos(angle), math.sin(angle)])
-            lifetime = LIFETIME * random.uniform(0.5, 1)
-            self.particles.append([
-                pos,
-                vel,
-                (255, 255, 255),
-                lifetime
-            ])
-    
+
+    def emit(self, pool: ParticlePool):
+        # [angle, speed, lifetime] for the whole burst in one draw
+        num_particles = max(round(NUM_PARTICLES*self.groups*pool.density), 1)
+        angle_range = 2*math.pi
+        draws = get_stream('cursor').uniform([-angle_range/2, 200, 0.5], [angle_range/2, 250, 1],
+                                             (num_particles, 3))
+        angle = 3*math.pi/2 + draws[:, 0]
+        direction = np.stack([np.cos(angle), np.sin(angle)], axis=-1)
+        anchor = pg.mouse.get_pos()
+        pool.add(np.array(anchor) + MAJOR_AXIS * direction, draws[:, 1:2] * direction, LIFETIME * draws[:, 2],
+                 kind=GRAVITY, minor_scale=5, major_scale=7)
+
     def update(self, dt: float):
         self.spawn_time += dt
         if self.spawn_time >= self.spawn_rate:
-            self.spawn_particles()
+            self.emit(self.pool)
             self.spawn_time = 0
+        self.pool.update(dt)
 
-        for i in range(len(self.particles)-1, -1, -1):
-            # gravity
-            self.particles[i][1] = self.particles[i][1] + np.array([0, 400]) * dt
-            self.particles[i][0] = self.particles[i][0] + self.particles[i][1] * dt
-            self.particles[i][3] -= dt
-            if self.particles[i][3] <= 0:
-                self.particles.pop(i)
-    
-    def render(self, display: pg.Surface):
-        for particle in self.particles:
-            drawpos = particle[0]
-            minor_axis = MINOR_AXIS * particle[3] * 5
-            major_axis = MAJOR_AXIS * particle[3] * 7
-            angle = math.atan2(particle[1][1], particle[1][0])
-            spark_points = get_spark(minor_axis, major_axis, 
-                                     drawpos, angle)
-            pg.draw.polygon(display, (255, 255, 255), spark_points)
-
-            glow = draw_circle(major_axis, (10, 10, 25))
-            drawpos = drawpos - np.array([major_axis, major_axis])
-            display.blit(glow, drawpos, special_flags=pg.BLEND_RGB_ADD)
\ No newline at end of file
+    def render_batch(self, particle_batch):
+        self.pool.render_batch(particle_batch, (0, 0))
@@ -0,0 +1,90 @@
+import numpy as np
+
+CELL_SIZE = 64
+# cell coords are packed into one int64 key, offset so negative cells stay positive
+KEY_OFFSET = 1 << 20
+KEY_SHIFT = 21
+
+def get_cells(pos: 'np.ndarray[np.float32]', cell_size: float) -> 'np.ndarray[np.int64]':
+    return np.floor(np.asarray(pos) / cell_size).astype(np.int64)
+
+def get_keys(cells: 'np.ndarray[np.int64]') -> 'np.ndarray[np.int64]':
+    return ((cells[..., 0] + KEY_OFFSET) << KEY_SHIFT) | (cells[..., 1] + KEY_OFFSET)
+
+def gather_ranges(starts: 'np.ndarray[np.int64]', counts: 'np.ndarray[np.int64]') -> 'np.ndarray[np.int64]':
+    # concatenation of arange(start, start+count) for every range, without a python loop
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(total)
+
+class SpatialHash:
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.pos = np.empty((0, 2), dtype=np.float32)
+        # point indices sorted by cell, and the [start, start+count) slice of each occupied cell
+        self.order = np.empty(0, dtype=np.int64)
+        self.cell_keys = np.empty(0, dtype=np.int64)
+        self.cell_starts = np.empty(0, dtype=np.int64)
+        self.cell_counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.pos.shape[0]
+
+    def build(self, pos: 'np.ndarray[np.float32]'):
+        self.pos = np.reshape(pos, (-1, 2))
+        keys = get_keys(get_cells(self.pos, self.cell_size))
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            keys[self.order], return_index=True, return_counts=True)
+
+    def query_cells(self, lo: 'np.ndarray[np.float32]', hi: 'np.ndarray[np.float32]') -> 'np.ndarray[np.int64]':
+        # every point in the cells overlapping the box, not filtered any further
+        if self.cell_keys.size == 0:
+            return np.empty(0, dtype=np.int64)
+        cell_lo = get_cells(lo, self.cell_size)
+        cell_hi = get_cells(hi, self.cell_size)
+        # sized from the bounds, so a huge box never builds its grid of cells
+        num_cells = max(int(cell_hi[0]) - int(cell_lo[0]) + 1, 0) * max(int(cell_hi[1]) - int(cell_lo[1]) + 1, 0)
+        if num_cells > self.cell_keys.size:
+            # the box covers more cells than are occupied, scan the occupied ones instead
+            cell_x = (self.cell_keys >> KEY_SHIFT) - KEY_OFFSET
+            cell_y = (self.cell_keys & ((1 << KEY_SHIFT) - 1)) - KEY_OFFSET
+            found = ((cell_x >= cell_lo[0]) & (cell_x <= cell_hi[0]) &
+                     (cell_y >= cell_lo[1]) & (cell_y <= cell_hi[1]))
+        else:
+            xs, ys = np.meshgrid(np.arange(cell_lo[0], cell_hi[0] + 1), np.arange(cell_lo[1], cell_hi[1] + 1))
+            keys = get_keys(np.stack([xs.ravel(), ys.ravel()], axis=-1))
+            slots = np.minimum(np.searchsorted(self.cell_keys, keys), self.cell_keys.size - 1)
+            found = np.zeros(self.cell_keys.size, dtype=bool)
+            found[slots[self.cell_keys[slots] == keys]] = True
+        return self.order[gather_ranges(self.cell_starts[found], self.cell_counts[found])]
+
+    def query_rect(self, lo: 'np.ndarray[np.float32]', hi: 'np.ndarray[np.float32]') -> 'np.ndarray[np.int64]':
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        candidates = self.query_cells(lo, hi)
+        pos = self.pos[candidates]
+        inside = np.all((pos >= lo) & (pos <= hi), axis=1)
+        return candidates[inside]
+
+    def query_radius(self, center: 'np.ndarray[np.float32]', radius: float) -> 'np.ndarray[np.int64]':
+        center = np.asarray(center)
+        candidates = self.query_cells(center - radius, center + radius)
+        rel = self.pos[candidates] - center
+        inside = np.einsum('ij,ij->i', rel, rel) <= radius**2
+        return candidates[inside]
+
+    def query_segment(self, start: 'np.ndarray[np.float32]', end: 'np.ndarray[np.float32]',
+                      radius: float) -> 'np.ndarray[np.int64]':
+        # points within radius of the segment start -> end
+        start, end = np.asarray(start), np.asarray(end)
+        candidates = self.query_cells(np.minimum(start, end) - radius, np.maximum(start, end) + radius)
+        seg = end - start
+        rel = self.pos[candidates] - start
+        seg_sqr = seg @ seg
+        if seg_sqr > 0:
+            t = np.clip(rel @ seg / seg_sqr, 0, 1)
+            rel = rel - t[:, None] * seg
+        inside = np.einsum('ij,ij->i', rel, rel) <= radius**2
+        return candidates[inside]
@@ -1,15 +1,19 @@
 import pygame as pg
 import moderngl as mgl
 import asyncio
-import sys, math
+import sys, os, math, time
 
-from .pymgl.graphics_engine import GraphicsEngine
+from .pymgl.graphics_engine import GraphicsEngine, QUALITY_PRESETS, DEFAULT_QUALITY
 from .pyfont.font import Font
 
 from .util.asset_loader import load_assets 
 from .util.sound_system import SoundSystem
+from .util.input_source import PygameInput
+from .util.frame_timer import FrameTimer
+from .util.render_scaler import RenderScaler
+from .util.input_log import InputRecorder, InputLog, PlaybackInput, PAUSED, TRANSITION
 
-from .menus.menus import InGame, MainMenu, TutorialMenu, ReplayMenu, DisclaimerIntro
+from .menus.menus import InGame, MainMenu, TutorialMenu, ReplayMenu, DisclaimerIntro, LAYER_Z
 from .entities.particles import CursorParticles
 
 MENU_MAP = {
@@ -22,6 +26,39 @@ MENU_MAP = {
 
 TRANSITION_TIME = 0.75
 
+# menus whose simulation runs at a fixed rate, decoupled from rendering
+SIM_MENUS = [MENU_MAP['game']]
+SIM_RATE = 120
+# catch up at most this many steps per frame, anything beyond is dropped
+MAX_SIM_STEPS = 8
+
+# menus with the spark trail following the mouse
+CURSOR_MENUS = [MENU_MAP['start'], MENU_MAP['tutorial'], MENU_MAP['replay']]
+# compositor effect the display is shaded with, per menu
+DISPLAY_EFFECTS = {
+    MENU_MAP['start']: 'synth_all',
+    MENU_MAP['tutorial']: 'synth_white',
+    MENU_MAP['replay']: 'synth_white',
+}
+
+# phases of a frame, in the order they show on the timing overlay
+FRAME_PHASES = [
+    'events', 'update', 'simulation', 'render', 'font', 'sprite_pass', 'particle_pass',
+    'bloom_pass', 'upload', 'composite', 'sound', 'flip', 'tick',
+]
+TIMING_KEY = pg.K_F3
+EXPORT_KEY = pg.K_F4
+TIMING_REFRESH = 0.5
+TIMING_LINE_HEIGHT = 14
+# frame time the automatic render scale aims for when the frame rate is uncapped
+FRAME_BUDGET = 1 / 60
+# phases left out of the frame time the render scale reacts to. the clock only waits, and with
+# vsync on the flip blocks until the next refresh however little the frame cost
+SCALER_EXCLUDE = ('tick', 'flip')
+
+# seconds per frame the disclaimer spends compiling the programs the other menus will need
+WARMUP_BUDGET = 0.004
+
 def create_rect(centerx: int, centery: int, width: int, height: int) -> pg.Rect:
     rect = pg.Rect(0, 0, width, height)
     rect.centerx = centerx
@@ -67,7 +104,9 @@ def screen_detransition(overlay: pg.Surface, transition_time: float, type: int):
         pg.draw.polygon(overlay, (10, 10, 10), points)
 
 class Game:
-    def __init__(self):
+    def __init__(self, sim_rate: int = SIM_RATE, fps_cap: int = 0, record_dir: str = None,
+                 playback: str = None, playback_speed: int = 1, use_pbo: bool = False,
+                 render_scale: float = 1.0, auto_scale: bool = False, quality: str = DEFAULT_QUALITY):
         # init
         pg.init()
         self.resolution = (960, 720)
@@ -79,10 +118,22 @@ class Game:
         self.ctx.blend_func = (
             mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA,
         )
-        self.graphics_engine = GraphicsEngine(self.ctx, self.resolution)
+        self.graphics_engine = GraphicsEngine(self.ctx, self.resolution, use_pbo)
+        self.graphics_engine.set_render_scale(render_scale)
+        # with auto_scale the render scale follows the in-game frame time, render_scale is its ceiling
+        self.render_scaler = None
+        if auto_scale:
+            self.render_scaler = RenderScaler(1 / fps_cap if fps_cap else FRAME_BUDGET,
+                                              self.graphics_engine.render_scale,
+                                              max_scale=self.graphics_engine.render_scale)
         self.display = pg.Surface(self.resolution)
         self.overlay = pg.Surface(self.resolution)
         self.clock = pg.time.Clock()
+        # 0 leaves the frame rate uncapped
+        self.fps_cap = fps_cap
+        self.sim_dt = 1 / sim_rate
+        self.sim_accumulator = 0
+        self.sim_alpha = 1
         self.font = Font(pg.image.load('./src/pyfont/font.png').convert())
         pg.mouse.set_visible(False)
         pg.event.set_grab(True)
@@ -107,9 +158,24 @@ class Game:
         self.sfx['turn'].set_volume(0.3)
         self.sfx['hit'].set_volume(1)
         self.sound_system = SoundSystem()
+        self.frame_timer = FrameTimer(FRAME_PHASES)
+        self.input_source = PygameInput(self.frame_timer)
+        self.font.render = self.frame_timer.timed('font', self.font.render)
+        self.show_timings = False
+        self.timing_text = []
+        self.timing_refresh = 0
+        # the overlay text gets a small layer of its own, a header, every phase, the frame, uploads and scale
+        self.timing_rect = pg.Rect(20, 40, self.resolution[0]/3, TIMING_LINE_HEIGHT * (len(FRAME_PHASES) + 4))
+        self.timing_surf = pg.Surface(self.timing_rect.size)
+        # upload bytes and frames since the overlay text was last refreshed
+        self.timing_bytes = 0
+        self.timing_frames = 0
+        self.held_keys = set()
 
         # for menus
         self.cursor = CursorParticles(groups=1)
+        # shared by the menu cursor and the in-game particles, every user begins its own batch
+        self.particle_batch = self.graphics_engine.create_particle_batch()
 
         self.sprites = load_assets(path='./assets/graphics')
         self.score = 0
@@ -129,33 +195,183 @@ class Game:
         self.transition_time = 0
         self.current_menu = 0
         self.next_menu = 0
+        self.set_quality(quality)
+        self.queue_warmups()
+
+        # every run is recorded into record_dir when it is set
+        self.record_dir = record_dir
+        self.recorder = None
+        # recorded frames played back per rendered frame
+        self.playback = None
+        self.playback_speed = playback_speed
+        if playback:
+            self.start_playback(playback)
     
+    def queue_warmups(self):
+        # every layer stack the menus composite, with and without the timing overlay. any stack
+        # not warmed in time is compiled on the frame that first draws it
+        compositor = self.graphics_engine.compositor
+        stacks = [[(effect, 'alpha'), ('default', 'alpha')]
+                  for effect in ['default'] + list(dict.fromkeys(DISPLAY_EFFECTS.values()))]
+        stacks.append([('default', 'alpha'), ('glow', 'alpha'), ('default', 'alpha')])
+        for stack in stacks:
+            for layers in (stack, stack + [('default', 'alpha')]):
+                self.graphics_engine.queue_warmup(lambda layers=layers : compositor.warm_up(layers))
+        # the pause popup can switch presets mid run
+        self.graphics_engine.warm_quality()
+
+    def set_quality(self, quality: str):
+        self.quality = quality
+        self.graphics_engine.set_quality(quality)
+        density = QUALITY_PRESETS[quality]['particle_density']
+        self.menus[MENU_MAP['game']].set_particle_density(density)
+        self.cursor.pool.density = density
+
+    def step_simulation(self, menu, frame_dt: float) -> dict:
+        self.sim_accumulator += frame_dt
+        steps = 0
+        retval = {}
+        while self.sim_accumulator >= self.sim_dt and not retval:
+            if steps == MAX_SIM_STEPS:
+                # too far behind, e.g. after a stall. drop the backlog instead of spiralling
+                self.sim_accumulator %= self.sim_dt
+                break
+            retval = menu.step(self.sim_dt)
+            self.sim_accumulator -= self.sim_dt
+            steps += 1
+        self.sim_steps = steps
+        self.sim_alpha = self.sim_accumulator / self.sim_dt
+        return retval
+
+    def start_recording(self, menu):
+        if not self.record_dir:
+            return
+        path = os.path.join(self.record_dir, f'run_{time.strftime("%Y%m%d_%H%M%S")}_{menu.seed}.rec')
+        self.recorder = InputRecorder(path, menu.seed, round(1 / self.sim_dt), self.resolution,
+                                      menu.show_tutorial, self.minimum_bullet_time)
+
+    def record_frame(self, menu):
+        if self.recorder is not None:
+            flags = (PAUSED if menu.paused else 0) | (TRANSITION if self.transition else 0)
+            self.recorder.add_frame(self.input_source.get_mouse_pos(), self.sim_steps, menu.frame_leaps, flags)
+        menu.frame_leaps = 0
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close(self.score)
+            self.recorder = None
+
+    def start_playback(self, path: str):
+        log = InputLog(path)
+        menu = self.menus[MENU_MAP['game']]
+        # the step the log was recorded with, whatever this game runs at
+        self.playback_dt = 1 / int(log.header['sim_rate'])
+        self.minimum_bullet_time = float(log.header['minimum_bullet_time'])
+        menu.show_tutorial = bool(log.header['show_tutorial'])
+        menu.input = PlaybackInput(log)
+        menu.on_load(int(log.header['seed']))
+        if log.header['skip_countdown']:
+            menu.skip_countdown()
+        self.playback = menu.input
+        self.current_menu = self.next_menu = MENU_MAP['game']
+
+    def play_recorded_frames(self, menu) -> dict:
+        # only quitting is taken from the window, everything else comes from the log
+        for event in self.input_source.get_events():
+            if event.type == pg.QUIT:
+                return {
+                    'exit': True
+                }
+        retval = {}
+        for i in range(self.playback_speed):
+            if self.playback.done():
+                retval = {
+                    'exit': False,
+                    'goto': 'replay'
+                }
+                break
+            retval = menu.play_frame(self.playback_dt)
+            if retval:
+                break
+        if retval:
+            menu.input = self.input_source
+            self.playback = None
+        self.sim_alpha = 1
+        return retval
+
+    def update_render_scale(self):
+        frame_time = self.frame_timer.get_last_frame(exclude=SCALER_EXCLUDE)
+        self.graphics_engine.set_render_scale(self.render_scaler.add_frame(frame_time))
+
+    def handle_timing_keys(self):
+        # edge triggered off the key state, so the menus still get every event
+        keys = pg.key.get_pressed()
+        pressed = {key for key in (TIMING_KEY, EXPORT_KEY) if keys[key] and key not in self.held_keys}
+        self.held_keys = {key for key in (TIMING_KEY, EXPORT_KEY) if keys[key]}
+        if TIMING_KEY in pressed:
+            self.show_timings = not self.show_timings
+            self.timing_refresh = 0
+        if EXPORT_KEY in pressed:
+            self.frame_timer.export_csv(f'frame_times_{time.strftime("%Y%m%d_%H%M%S")}.csv')
+
+    def render_timings(self, dt: float):
+        # percentiles are only recomputed every TIMING_REFRESH seconds so the text stays readable
+        self.timing_refresh -= dt
+        self.timing_frames += 1
+        if self.timing_refresh <= 0:
+            self.timing_refresh = TIMING_REFRESH
+            percentiles = self.frame_timer.get_percentiles() * 1000
+            self.timing_text = [f'{"ms":<14}{"p50":>8}{"p95":>8}{"p99":>8}']
+            for phase, (p50, p95, p99) in zip(FRAME_PHASES + ['frame'], percentiles):
+                self.timing_text.append(f'{phase:<14}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}')
+            bytes_uploaded = self.graphics_engine.get_bytes_uploaded()
+            upload_kb = (bytes_uploaded - self.timing_bytes) / self.timing_frames / 1024
+            self.timing_text.append(f'{"upload kb":<14}{upload_kb:>8.1f}')
+            self.timing_text.append(f'{"render scale":<14}{self.graphics_engine.render_scale:>8.3f}')
+            self.timing_bytes = bytes_uploaded
+            self.timing_frames = 0
+        self.timing_surf.fill((0, 0, 0))
+        for i, line in enumerate(self.timing_text):
+            self.font.render(self.timing_surf, line, 0, TIMING_LINE_HEIGHT*i, (255, 255, 255), 8)
+
     async def run(self):
+        timer = self.frame_timer
         while True:
             
-            retval = self.menus[self.current_menu].update()
+            menu = self.menus[self.current_menu]
+            if self.playback is not None and self.current_menu in SIM_MENUS:
+                with timer.phase('simulation'):
+                    retval = self.play_recorded_frames(menu)
+            else:
+                with timer.phase('update'):
+                    retval = menu.update()
+                if not retval and self.current_menu in SIM_MENUS:
+                    with timer.phase('simulation'):
+                        retval = self.step_simulation(menu, self.clock.get_time() / 1000)
+                    self.record_frame(menu)
             if retval:
+                self.stop_recording()
                 if retval['exit']:
                     pg.quit()
                     sys.exit()
                 else:
                     self.transition = 1
                     self.next_menu = MENU_MAP[retval['goto']]
-            self.sound_system.play_queued_sounds()
-            self.ctx.clear(0, 0, 0)
+            self.handle_timing_keys()
+            with timer.phase('sound'):
+                self.sound_system.play_queued_sounds()
             dt = self.clock.get_time() / 1000
 
-            if MENU_MAP['start'] == self.current_menu: 
-                self.graphics_engine.render(self.display, self.display.get_rect(), 
-                                            shader='synth_all')
-            elif MENU_MAP['tutorial'] == self.current_menu or MENU_MAP['replay'] == self.current_menu:
-                self.graphics_engine.render(self.display, self.display.get_rect(), 
-                                            shader='synth_white')
-            else:
-                self.graphics_engine.render(self.display, self.display.get_rect(), shader='default')
-            
+            timer.start('render')
+            if self.current_menu == MENU_MAP['disclaimer']:
+                self.graphics_engine.warm_up(WARMUP_BUDGET)
+            self.graphics_engine.compositor.begin()
+            rendered_menu = self.current_menu
             self.overlay.fill((0, 0, 0))
-            self.menus[self.current_menu].render()
+            if self.current_menu in SIM_MENUS:
+                menu.render(self.sim_alpha)
+            else:
+                menu.render()
 
             if self.transition:
                 self.transition_time += dt
@@ -173,16 +389,36 @@ class Game:
                             self.current_menu = self.next_menu
                             if self.current_menu == MENU_MAP['game']:
                                 self.menus[self.current_menu].on_load()
+                                self.sim_accumulator = 0
+                                self.start_recording(self.menus[self.current_menu])
                     case 3:
                         screen_detransition(self.overlay, self.transition_time, self.next_menu)
-                
-            self.graphics_engine.render(self.overlay, self.overlay.get_rect(), shader='default')
 
-            self.clock.tick()
-            pg.display.flip()
+            with timer.phase('upload'):
+                # the cursor sparks are drawn into the display on the gpu, before it is shaded
+                self.particle_batch.begin()
+                if rendered_menu in CURSOR_MENUS:
+                    self.cursor.render_batch(self.particle_batch)
+                self.graphics_engine.add_surface_layer('display', self.display, LAYER_Z['display'],
+                                                       DISPLAY_EFFECTS.get(rendered_menu, 'default'),
+                                                       particle_batch=self.particle_batch)
+                self.graphics_engine.add_surface_layer('overlay', self.overlay, LAYER_Z['overlay'])
+                if self.show_timings:
+                    self.render_timings(dt)
+                    self.graphics_engine.add_surface_layer('timings', self.timing_surf, LAYER_Z['timings'],
+                                                           rect=self.timing_rect)
+            with timer.phase('composite'):
+                self.graphics_engine.compositor.render()
+            timer.stop()
+
+            with timer.phase('tick'):
+                self.clock.tick(self.fps_cap)
+            with timer.phase('flip'):
+                pg.display.flip()
+            timer.end_frame()
+            if self.render_scaler is not None and rendered_menu in SIM_MENUS:
+                self.update_render_scale()
 
             await asyncio.sleep(0)
 
             # pg.display.set_caption(f'fps: {self.clock.get_fps()}')
-    
-        
\ No newline at end of file
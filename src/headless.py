@@ -0,0 +1,165 @@
+import pygame as pg
+import numpy as np
+import sys, random, math, time, argparse
+
+from .simulation import Simulation
+from .util.sound_system import SoundSystem
+from .util.input_source import ScriptedInput
+from .util.input_log import InputRecorder, InputLog, PlaybackInput
+
+RESOLUTION = (960, 720)
+SIM_RATE = 120
+# leap once every this many steps in the default script
+LEAP_INTERVAL = 30
+# how far the default script turns its aim between leaps, in radians
+AIM_TURN = 2.4
+
+class NullSoundSystem(SoundSystem):
+    # no mixer, every sound is dropped
+    def queue_new_sound(self, sound: pg.mixer.Sound):
+        pass
+
+    def play_queued_sounds(self):
+        pass
+
+class HeadlessGame:
+    # the fields of Game a Simulation reads and writes, without a window, gl context or mixer
+    def __init__(self, input_source, resolution: tuple[int, int] = RESOLUTION):
+        self.resolution = resolution
+        self.sfx = {
+            'hit': None,
+            'kill': [None for i in range(5)],
+            'turn': None,
+            'countdown': None,
+        }
+        self.sound_system = NullSoundSystem()
+        self.input_source = input_source
+        self.transition = 0
+
+        self.score = 0
+        self.score_add = 100
+        self.highscore = 0
+        self.kill_chain = 0
+        self.minimum_bullet_time = 0
+
+def leap_script(resolution: tuple[int, int] = RESOLUTION, leap_interval: int = LEAP_INTERVAL) -> callable:
+    # leaps every leap_interval frames, turning the aim a fixed amount each time
+    center = np.array(resolution) * 0.5
+    radius = min(resolution) * 0.4
+    def script(frame: int) -> tuple[list[pg.Event], tuple[float, float]]:
+        leap = frame // leap_interval
+        angle = leap * AIM_TURN
+        mouse_pos = tuple(center + radius * np.array([math.cos(angle), math.sin(angle)]))
+        events = []
+        if frame % leap_interval == leap_interval - 1:
+            events.append(pg.event.Event(pg.MOUSEBUTTONUP, button=1, pos=mouse_pos))
+        return events, mouse_pos
+    return script
+
+def run(steps: int, sim_rate: int = SIM_RATE, seed: int = 0, script: callable = None,
+        record: str = None) -> dict:
+    # every run after a death gets the next seed from seed
+    seeds = random.Random(seed)
+    input_source = ScriptedInput(script or leap_script())
+    game = HeadlessGame(input_source)
+    sim = Simulation(game)
+    sim.show_tutorial = False
+
+    def start():
+        sim.on_load(seeds.getrandbits(32))
+        # nothing to watch
+        sim.skip_countdown()
+
+    start()
+    # only the first run is recorded
+    recorder = None
+    if record:
+        recorder = InputRecorder(record, sim.seed, sim_rate, game.resolution, sim.show_tutorial,
+                                 game.minimum_bullet_time, skip_countdown=True)
+    sim_dt = 1 / sim_rate
+    deaths = 0
+    start_time = time.perf_counter()
+    for i in range(steps):
+        for event in input_source.get_events():
+            sim.handle_event(event)
+        retval = sim.step(sim_dt)
+        if recorder is not None:
+            recorder.add_frame(input_source.get_mouse_pos(), 1, sim.frame_leaps, 0)
+        sim.frame_leaps = 0
+        if retval.get('goto') == 'replay':
+            if recorder is not None:
+                recorder.close(game.score)
+                recorder = None
+            deaths += 1
+            start()
+    elapsed = time.perf_counter() - start_time
+    if recorder is not None:
+        recorder.close(game.score)
+
+    return {
+        'steps': steps,
+        'seconds': elapsed,
+        'steps_per_second': steps / elapsed if elapsed > 0 else math.inf,
+        'simulated_seconds': steps * sim_dt,
+        'deaths': deaths,
+        'highscore': game.highscore,
+    }
+
+def play(path: str) -> dict:
+    # a recorded run, as fast as it will go
+    log = InputLog(path)
+    input_source = PlaybackInput(log)
+    game = HeadlessGame(input_source, tuple(int(size) for size in log.header['resolution']))
+    game.minimum_bullet_time = float(log.header['minimum_bullet_time'])
+    sim = Simulation(game)
+    sim.show_tutorial = bool(log.header['show_tutorial'])
+    sim.on_load(int(log.header['seed']))
+    if log.header['skip_countdown']:
+        sim.skip_countdown()
+
+    sim_dt = 1 / int(log.header['sim_rate'])
+    steps = 0
+    start_time = time.perf_counter()
+    while not input_source.done():
+        steps += int(log[input_source.frame + 1]['steps'])
+        if sim.play_frame(sim_dt):
+            break
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        'frames': input_source.frame + 1,
+        'steps': steps,
+        'seconds': elapsed,
+        'steps_per_second': steps / elapsed if elapsed > 0 else math.inf,
+        'simulated_seconds': steps * sim_dt,
+        'score': game.score,
+        'recorded_score': float(log.header['score']),
+        'complete': log.is_complete(),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run the in-game simulation without a window, gl context or audio')
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--rate', type=int, default=SIM_RATE, help='simulation steps per simulated second')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--leap-interval', type=int, default=LEAP_INTERVAL, help='steps between scripted leaps')
+    parser.add_argument('--record', metavar='LOG', help='record the input of the first run into LOG')
+    parser.add_argument('--play', metavar='LOG', help='play back a recorded run instead of the script')
+    args = parser.parse_args()
+
+    if args.play:
+        result = play(args.play)
+        print(f"{result['frames']} frames, {result['steps']} steps in {result['seconds']:.3f}s, "
+              f"{result['steps_per_second']:.0f} steps/s ({result['simulated_seconds']:.1f}s simulated)")
+        if result['complete']:
+            matched = 'matches' if result['score'] == result['recorded_score'] else 'does not match'
+            print(f"score {result['score']:.0f} {matched} the recorded {result['recorded_score']:.0f}")
+        else:
+            print(f"score {result['score']:.0f}, the recording was not closed")
+        sys.exit()
+
+    result = run(args.steps, args.rate, args.seed, leap_script(leap_interval=args.leap_interval), args.record)
+    print(f"{result['steps']} steps in {result['seconds']:.3f}s, "
+          f"{result['steps_per_second']:.0f} steps/s "
+          f"({result['simulated_seconds']:.1f}s simulated, {result['deaths']} deaths, "
+          f"highscore {result['highscore']:.0f})")
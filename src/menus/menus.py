@@ -1,8 +1,10 @@
 import pygame as pg
 import numpy as np
-import random, math
+import math
 
-from ..entities.entity import Player, Enemies
+from ..entities.entity import ENTITY_SIZE
+from ..util.sprite_cache import get_circle
+from ..simulation import Simulation
 from .popups import MusicPopup, BUTTON_COLOR, BUTTON_COLOR_HOVER, POPUP_SIZE, SHADOW_COLOR
 from .popups import PausePopup
 
@@ -10,8 +12,16 @@ DEFAULT_FILL = (25, 30, 65)
 BULLET_TIME_FILL = (25, 30, 65)
 REAL_TIME_FILL = (65, 30, 25)
 
-SCREEN_SHAKE = 0.5
-ENTER_BULLET_TIME = 0.25
+# how far past the screen edge something is still drawn
+VIEW_MARGIN = 40
+
+# compositor layers, bottom to top
+LAYER_Z = {
+    'display': 0,
+    'entities': 1,
+    'overlay': 2,
+    'timings': 3,
+}
 
 BUTTON_BLUE = (78, 61, 227)
 
@@ -31,73 +41,41 @@ def draw_boundary(display: pg.Surface, display_offset: tuple[float, float], radi
     boundary_surf.set_colorkey((255, 255, 255))
     display.blit(boundary_surf, (0, 0))
 
-class InGame:
+class InGame(Simulation):
     def __init__(self, game):
+        super().__init__(game)
         # from Game class
-        self.game = game
         self.display = game.display
         self.overlay = game.overlay
         self.graphics_engine = game.graphics_engine
         self.clock = game.clock
-        self.resolution = game.resolution
         self.font = game.font
-        self.sfx = game.sfx
-        self.sound_system = game.sound_system
 
-        self.crossflare_surf = pg.Surface(self.resolution)
+        self.sprite_batch = self.graphics_engine.create_sprite_batch([get_circle(ENTITY_SIZE, (255, 255, 255))])
+        self.particle_batch = game.particle_batch
+        self.bloom = self.graphics_engine.create_bloom()
 
-        self.show_tutorial = True
         self.mouse_sprite = game.sprites['ui']['mouse']
         self.space_sprite = game.sprites['ui']['space']
-        self.boundary_radius = 1000
 
         self.pause_popup = PausePopup(game, self)
-        self.show_pause = False
         self.pause_grow = 0
-        self.paused = False
 
         # assets
         self.crosshair = self.game.sprites['ui']['crosshair']
         self.crosshair_size = self.crosshair.get_size()
 
-        # constants
-        self.resolve_interval = 1
-
         self.on_load()
     
-    def on_load(self):
-        self.particle_groups = []
-        self.bullets = []
-        add_particle_group = lambda particle_group : self.particle_groups.append(particle_group)
-        self.player = Player((0, 0), add_particle_group, self.sfx, self.sound_system)
-        self.enemies = Enemies(5, lambda bullet : self.bullets.append(bullet), add_particle_group,
-                               self.show_tutorial)
-
-        # game state management
-        self.resolve_enemy_actions = False
-        self.time_spent_in_bullet_time = 0
-        self.resolve_time = 0
-        self.enter_bullet_time_time = 0
-        self.screen_shake = 0
-        self.shake_offset = [0, 0]
-
-        self.transitioning = True
-        self.show_pause = False
-
-        # app state management
-        self.game.score = 0
-        self.game.kill_chain = 0
-        self.game.score_add = 100
-        self.countdown = 5
-        self.dead = False
-        self.death_countdown = 2
+    def has_particles(self) -> bool:
+        return len(self.particles) > 0
 
     def get_display_offset(self) -> tuple[float, float]:
         offset = np.array(self.resolution) * 0.5 - self.player.pos + np.array(self.shake_offset)
         return (offset[0], offset[1])
     
     def update(self) -> dict:
-        events = pg.event.get()
+        events = self.input.get_events()
         for event in events:
             if event.type == pg.QUIT:
                 return {
@@ -110,119 +88,30 @@ class InGame:
                     self.show_pause = True
                     self.paused = True
                     self.pause_grow = 0
-            if self.countdown <= 0 and not self.dead and not self.transitioning and not self.paused:
-                if event.type == pg.MOUSEBUTTONUP or (event.type == pg.KEYDOWN and event.key == pg.K_SPACE):
-                    if self.player.bullet_time:
-                        kills = self.player.take_turn(self.enemies, self.boundary_radius)
-                        if kills != -1:
-                            if kills == 0:
-                                self.resolve_enemy_actions = True
-                            if self.resolve_enemy_actions:
-                                self.game.score_add = 100
-                                self.game.kill_chain = 0
-                            else:
-                                for i in range(kills):
-                                    self.sound_system.queue_new_sound(self.sfx['kill'][self.game.kill_chain])
-                                    self.game.score += self.game.score_add * (1 + self.game.minimum_bullet_time)
-                                    self.game.score_add += 50
-                                    self.game.kill_chain = min(self.game.kill_chain + 1, 4)
-                                self.time_spent_in_bullet_time = self.game.minimum_bullet_time
-                            self.screen_shake = SCREEN_SHAKE
-        
-        dt = self.clock.get_time() / 1000
-        if self.countdown <= 0 and not self.dead and not self.transitioning and not self.paused:
-            # these should not be influenced by bulletime
-            # screen shake
-            if self.screen_shake > 0:
-                self.screen_shake -= dt
-                self.shake_offset = [
-                    random.uniform(0, 8) - 4,
-                    random.uniform(0, 8) - 4,
-                ]
-
-            [particle_group.update(dt) for particle_group in self.particle_groups]
-
-            # enemies catch up from bullet time
-            if self.resolve_enemy_actions:
-                self.time_spent_in_bullet_time -= dt
-                self.enemies.update(dt, self.player.pos)
-                
-                if self.time_spent_in_bullet_time <= 0:
-                    self.time_spent_in_bullet_time = 0
-                    self.resolve_enemy_actions = False
-            # player is in bullet time or are entering bullet time
-            else:
-                self.time_spent_in_bullet_time += dt
-                if not self.player.bullet_time:
-                    self.enter_bullet_time_time += dt
-                    dt *= (1 - self.enter_bullet_time_time/ENTER_BULLET_TIME)/10
-                    if self.enter_bullet_time_time >= ENTER_BULLET_TIME:
-                        self.enter_bullet_time_time = 0
-                        # play a sound
-                        # flash the screen
-                        self.player.bullet_time = True
-
-            
-            if self.player.bullet_time:
-                dt /= 100
-            [bullet.update(dt) for bullet in self.bullets]
-            [self.bullets.pop(i) for i in range(len(self.bullets)-1, -1, -1) if self.bullets[i].is_dead()]
-
-            self.dead = self.player.check_hit(self.bullets)
-            
-            m_relpos = np.array(pg.mouse.get_pos()) - np.array(self.resolution) * 0.5
-            self.player.update_shadow(math.atan2(m_relpos[1], m_relpos[0]))
-        elif self.transitioning:
-            # do nothing
-            self.transitioning = bool(self.game.transition)
-        else:
-            if self.paused:
-                if self.show_pause:
-                    self.pause_grow = min(self.pause_grow + 2*dt, 1)
-                    retval = self.pause_popup.update(events)
-                    if retval and retval['goto'] == 'start':
-                        return {
-                            'exit': False,
-                            'goto': 'start'
-                        }
-                    if retval and retval['goto'] == 'game':
-                        self.show_pause = False
-                else:
-                    self.pause_grow -= 2*dt
-                    if self.pause_grow <= 0:
-                        self.pause_grow = 0
-                        self.paused = False
-                        self.countdown = 5
-                return {}
-            [particle_group.update(dt) for particle_group in self.particle_groups]
-
-            if self.countdown > 0:
-                prev_count = self.countdown
-                self.countdown -= dt
-                if math.ceil(prev_count) != math.ceil(self.countdown):
-                    self.sfx['countdown'].play()
-
-            if self.dead:
-                self.player.death()
-                self.player.death_particles.update(dt)
-                self.death_countdown -= dt
-                self.shake_offset = [
-                    random.uniform(0, 8) - 4,
-                    random.uniform(0, 8) - 4,
-                ]
-                if self.death_countdown < 0:
-                    if not self.show_tutorial:
-                        self.game.highscore = max(self.game.highscore, self.game.score)
-                    else:
-                        self.show_tutorial = False
-                        self.transitioning = True
+            self.handle_event(event)
+
+        # the pause popup is ui, it runs at the frame rate while the simulation is frozen
+        if self.paused and not self.transitioning:
+            dt = self.clock.get_time() / 1000
+            if self.show_pause:
+                self.pause_grow = min(self.pause_grow + 2*dt, 1)
+                retval = self.pause_popup.update(events)
+                if retval and retval['goto'] == 'start':
                     return {
                         'exit': False,
-                        'goto': 'replay'
+                        'goto': 'start'
                     }
+                if retval and retval['goto'] == 'game':
+                    self.show_pause = False
+            else:
+                self.pause_grow -= 2*dt
+                if self.pause_grow <= 0:
+                    self.pause_grow = 0
+                    self.resume()
         return {}
-    
-    def render(self):
+
+    def render(self, alpha: float = 1):
+        # alpha is how far between the last two simulation steps this frame falls
         if self.player.bullet_time:
             self.display.fill(BULLET_TIME_FILL)
         else:
@@ -231,13 +120,32 @@ class InGame:
         display_offset = self.get_display_offset()
         draw_boundary(self.display, display_offset, self.boundary_radius)
 
-        self.crossflare_surf.fill((0, 0, 0, 0))
-        self.player.render(self.crossflare_surf, display_offset)
-        self.enemies.render(self.crossflare_surf, display_offset)
-        [bullet.render(self.crossflare_surf, display_offset) for bullet in self.bullets]
-        [particle_group.render(self.crossflare_surf, display_offset) for particle_group in self.particle_groups]
-        self.graphics_engine.render(self.crossflare_surf, self.crossflare_surf.get_rect(), 
-                                    shader='gaussian_blur')
+        # entities and bullets are drawn in one instanced call on the gpu
+        self.sprite_batch.begin()
+        self.player.render_batch(self.sprite_batch, display_offset)
+        # cull against the camera using the spatial hashes
+        half_view = np.array(self.resolution) * 0.5 + VIEW_MARGIN
+        view = (self.player.pos - half_view, self.player.pos + half_view)
+        self.enemies.render_batch(self.sprite_batch, display_offset, view)
+        bullet_grid, drift = self.bullets.get_grid()
+        drift += self.bullets.max_step
+        visible = bullet_grid.query_rect(view[0] - drift, view[1] + drift)
+        self.bullets.render_batch(self.sprite_batch, display_offset, np.sort(visible), alpha,
+                                  self.graphics_engine.get_quality()['glow'])
+        with self.game.frame_timer.phase('sprite_pass'):
+            self.sprite_batch.render()
+
+        # particles are added on top of the sprites, so they get blurred with them
+        if self.has_particles():
+            self.particle_batch.begin()
+            self.particles.render_batch(self.particle_batch, display_offset)
+            with self.game.frame_timer.phase('particle_pass'):
+                self.particle_batch.render(self.sprite_batch.framebuffer)
+        # the compositor adds the bloom back when it draws the entities
+        with self.game.frame_timer.phase('bloom_pass'):
+            bloom = self.bloom.apply(self.sprite_batch.texture)
+        self.graphics_engine.compositor.add_layer('entities', self.sprite_batch.texture, LAYER_Z['entities'],
+                                                  effect='glow', bloom=bloom, bloom_intensity=self.bloom.intensity)
 
         if self.countdown > 0:
             self.font.render(self.overlay, f'{math.ceil(self.countdown)}', 
@@ -263,7 +171,7 @@ class InGame:
         if self.paused:
             self.pause_popup.render(self.pause_grow)
 
-        cursor_pos = np.array(pg.mouse.get_pos()) - np.array(self.crosshair_size) * 0.5
+        cursor_pos = np.array(self.input.get_mouse_pos()) - np.array(self.crosshair_size) * 0.5
         self.overlay.blit(self.crosshair, cursor_pos)
 
 HOVER_TIME = 0.5
@@ -301,7 +209,7 @@ class MainMenu:
         self.show_music_popup = False
 
     def update(self):
-        events = pg.event.get()
+        events = self.game.input_source.get_events()
         for event in events:
             if event.type == pg.QUIT:
                 return {
@@ -454,7 +362,6 @@ class MainMenu:
 
         self.display.blit(self.title_card, (0, self.resolution[1]/7))
 
-        self.cursor.render(self.display)
 
 class TutorialMenu:
     def __init__(self, game):
@@ -496,7 +403,7 @@ class TutorialMenu:
         }
 
     def update(self):
-        events = pg.event.get()
+        events = self.game.input_source.get_events()
         for event in events:
             if event.type == pg.QUIT:
                 return {
@@ -578,7 +485,6 @@ class TutorialMenu:
         # print(self.tutorial_scene['bullets'])
         for bullet_in_tutorial in self.tutorial_scene['bullets']:
             pg.draw.circle(self.display, bullet_in_tutorial[1], bullet_in_tutorial[0], bullet_in_tutorial[2])
-        self.cursor.render(self.display)
 
 class ReplayMenu:
     def __init__(self, game):
@@ -608,7 +514,7 @@ class ReplayMenu:
         self.slider_text_y = self.diff_track.top - self.font.text_height(self.slider_text, 15, width/2) - 10
  
     def update(self):
-        events = pg.event.get()
+        events = self.game.input_source.get_events()
         for event in events:
             if event.type == pg.QUIT:
                 return {
@@ -704,7 +610,6 @@ class ReplayMenu:
         if self.diff_slider_follow or self.diff_slider_hover:
             pg.draw.circle(self.display, (200, 200, 255), self.diff_slider.center, self.diff_slider.width/2, 5)
         
-        self.cursor.render(self.display)
 
 class DisclaimerIntro:
     def __init__(self, game):
@@ -725,7 +630,7 @@ class DisclaimerIntro:
         self.font_color = (200, 100, 150)
 
     def update(self):
-        events = pg.event.get()
+        events = self.game.input_source.get_events()
         for event in events:
             if event.type == pg.QUIT:
                 return {
@@ -1,6 +1,8 @@
 import pygame as pg
 import math
 
+from ..pymgl.graphics_engine import QUALITY_PRESETS
+
 def create_rect(centerx: int, centery: int, width: int, height: int) -> pg.Rect:
     rect = pg.Rect(0, 0, width, height)
     rect.centerx = centerx
@@ -117,6 +119,9 @@ class PausePopup:
         self.slider_hover = False
         self.slider_follow = False
 
+        # cycles through the quality presets
+        self.quality_btn = create_rect(self.track.centerx, self.popup.bottom-165, self.track.width, 30)
+
     def update(self, events: pg.Event):
         
         for event in events:
@@ -136,6 +141,9 @@ class PausePopup:
                     }
                 if self.slider.collidepoint(event.pos):
                     self.slider_follow = True
+                if self.quality_btn.collidepoint(event.pos):
+                    qualities = list(QUALITY_PRESETS)
+                    self.game.set_quality(qualities[(qualities.index(self.game.quality) + 1) % len(qualities)])
             if event.type == pg.MOUSEBUTTONUP:
                 self.slider_follow = False
                 new_volume = (self.slider.centerx - self.track.left) / self.track.width
@@ -180,6 +188,11 @@ class PausePopup:
             #                  (255, 255, 255), 15, 'left')
             self.font.render(self.overlay, 'music', self.popup.left+25, self.slider.centery, 
                              (255, 255, 255), 15, 'left')
+            self.font.render(self.overlay, 'quality', self.popup.left+25, self.quality_btn.centery,
+                             (255, 255, 255), 15, 'left')
+            pg.draw.rect(self.overlay, BUTTON_COLOR_HOVER, self.quality_btn)
+            self.font.render(self.overlay, self.game.quality, self.quality_btn.centerx, self.quality_btn.centery,
+                             (255, 255, 255), 15, 'center')
             pg.draw.rect(self.overlay, TRACK_COLOR, self.track)
             if self.slider_hover or self.slider_follow:
                 pg.draw.circle(self.overlay, SLIDER_COLOR_HOVER, self.slider.center, self.slider.width/2)
@@ -0,0 +1,103 @@
+import moderngl as mgl
+import numpy as np
+import pygame as pg
+import glm
+
+from .defines import inject_defines
+from .quad import make_quad_vbo, make_quad_vao
+
+# the compositor shader has a sampler slot per layer
+MAX_LAYERS = 4
+EFFECTS = {
+    'default': 0,
+    'synth_all': 1,
+    'synth_white': 2,
+    'glow': 3,
+}
+BLENDS = {
+    'alpha': 0,
+    'additive': 1,
+}
+
+class Compositor:
+    # every layer of a frame is combined into the screen in one draw, instead of a full screen
+    # draw per layer. layers are registered each frame and drawn bottom to top by z
+    def __init__(self, ctx: mgl.Context, res: tuple[int, int], vertex_shader: str, frag_shader: str):
+        self.ctx = ctx
+        self.res = res
+        self.vertex_shader = vertex_shader
+        self.frag_shader = frag_shader
+
+        self.quad_vbo = make_quad_vbo(self.ctx)
+        # ((effect, blend) per layer) -> (program, vao), the effects are compiled in rather than branched on
+        self.variants : dict[tuple, tuple[mgl.Program, mgl.VertexArray]] = {}
+
+        # name -> (z, texture, effect, blend, rect)
+        self.layers : dict[str, tuple] = {}
+        # (texture, intensity) the glow layer adds, there is one bloom sampler
+        self.bloom = None
+
+    def get_variant(self, key: tuple[tuple[int, int]]) -> tuple[mgl.Program, mgl.VertexArray]:
+        if key not in self.variants:
+            defines = {'NUM_LAYERS': len(key)}
+            for i, (effect, blend) in enumerate(key):
+                defines[f'LAYER{i}_EFFECT'] = effect
+                defines[f'LAYER{i}_BLEND'] = blend
+            program = self.ctx.program(vertex_shader=self.vertex_shader,
+                                       fragment_shader=inject_defines(self.frag_shader, defines))
+            # drivers strip the samplers and uniforms a variant never reads
+            if 'res' in program:
+                program['res'].write(glm.vec2(self.res[0], self.res[1]))
+            for i in range(len(key)):
+                if f'layer{i}' in program:
+                    program[f'layer{i}'] = i
+            if 'bloom' in program:
+                program['bloom'] = MAX_LAYERS
+            vao = make_quad_vao(self.ctx, program, self.quad_vbo)
+            self.variants[key] = (program, vao)
+        return self.variants[key]
+
+    def warm_up(self, stack: list[tuple[str, str]]):
+        # compiles the program for a stack of (effect, blend) layers, bottom to top, ahead of its first frame
+        self.get_variant(tuple((EFFECTS[effect], BLENDS[blend]) for effect, blend in stack))
+
+    def begin(self):
+        self.layers = {}
+        self.bloom = None
+
+    def add_layer(self, name: str, texture: mgl.Texture, z: int, effect: str = 'default',
+                  blend: str = 'alpha', rect: pg.Rect = None, bloom: mgl.Texture = None,
+                  bloom_intensity: float = 1):
+        # rect is where the texture lands on screen in pixels, the whole screen when None.
+        # bloom is stretched over the layer and added to it by the glow effect
+        if bloom is not None:
+            self.bloom = (bloom, bloom_intensity)
+        if rect is None:
+            rect = pg.Rect(0, 0, self.res[0], self.res[1])
+        self.layers[name] = (z, texture, EFFECTS[effect], BLENDS[blend], pg.Rect(rect))
+        if len(self.layers) > MAX_LAYERS:
+            raise ValueError(f'the compositor takes at most {MAX_LAYERS} layers, got {list(self.layers)}')
+
+    def render(self, framebuffer: mgl.Framebuffer = None):
+        # onto the screen unless framebuffer is given
+        layers = sorted(self.layers.values(), key=lambda layer : layer[0])
+        program, vao = self.get_variant(tuple((effect, blend) for z, texture, effect, blend, rect in layers))
+        rects = np.zeros((len(layers), 4), dtype='f4')
+        for i, (z, texture, effect, blend, rect) in enumerate(layers):
+            texture.use(location=i)
+            rects[i] = (rect.x, rect.y, rect.width, rect.height)
+        if 'rect' in program:
+            program['rect'].write(rects[:program['rect'].array_length])
+        if 'bloom' in program:
+            bloom, bloom_intensity = self.bloom or (layers[0][1], 0.0)
+            bloom.use(location=MAX_LAYERS)
+            program['bloom_intensity'] = bloom_intensity
+
+        (framebuffer or self.ctx.screen).use()
+        vao.render()
+
+    def destroy(self):
+        for program, vao in self.variants.values():
+            vao.release()
+            program.release()
+        self.quad_vbo.release()
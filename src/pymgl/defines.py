@@ -0,0 +1,5 @@
+def inject_defines(source: str, defines: dict[str, any]) -> str:
+    # shader source with a #define per item, right after the #version line that has to come first
+    version, body = source.split('\n', 1)
+    lines = [f'#define {name} {value}' for name, value in defines.items()]
+    return '\n'.join([version] + lines + [body])
@@ -1,139 +1,634 @@
 import moderngl as mgl
 import numpy as np
 import pygame as pg
-import glm, os
+import glm, time
 
-FOV = 50
-NEAR = 0.1
-FAR = 100
+from .compositor import Compositor
+from .defines import inject_defines
+from .quad import make_quad_vbo, make_quad_vao
 
-class GraphicsEngine:
-    def __init__(self, ctx: mgl.Context, res: tuple[int, int]):
+SHADER_PATH = './src/pymgl/shaders'
+BATCH_CAPACITY = 1024
+# pos: 2f, scale: 1f, color: 4f, sprite: 1f
+INSTANCE_DTYPE = np.dtype([
+    ('pos', 'f4', 2),
+    ('scale', 'f4'),
+    ('color', 'f4', 4),
+    ('sprite', 'f4'),
+])
+PARTICLE_CAPACITY = 1024
+# pos: 2f, angle: 1f, lifetime: 1f, size: 2f, glow: 1f
+PARTICLE_DTYPE = np.dtype([
+    ('pos', 'f4', 2),
+    ('angle', 'f4'),
+    ('lifetime', 'f4'),
+    ('size', 'f4', 2),
+    ('glow', 'f4'),
+])
+SPARK_COLOR = (255, 255, 255)
+GLOW_COLOR = (10, 10, 25)
+# changed rows closer than this are uploaded as one band
+BAND_GAP = 16
+# pixel buffers a layer cycles through when uploading through them
+PBO_COUNT = 2
+# halvings of the resolution the bloom is blurred at, 2 blurs at half and quarter size
+BLOOM_LEVELS = 2
+# gaussian radius in texels of each level, sigma is half of it
+BLOOM_RADIUS = 8
+# how much of each level is added back
+BLOOM_INTENSITY = 0.8
+# smallest share of the resolution the world is drawn at
+MIN_RENDER_SCALE = 0.25
+
+# the knobs each quality preset turns. glow is the halo around bullets and particles,
+# particle_density the share of sparks every burst makes. low has no bloom at all
+QUALITY_PRESETS = {
+    'low': {'bloom_levels': 0, 'bloom_radius': 4, 'glow': False, 'particle_density': 0.4},
+    'medium': {'bloom_levels': 2, 'bloom_radius': 4, 'glow': True, 'particle_density': 0.6},
+    'high': {'bloom_levels': BLOOM_LEVELS, 'bloom_radius': BLOOM_RADIUS, 'glow': True, 'particle_density': 1.0},
+}
+DEFAULT_QUALITY = 'high'
+
+class SpriteBatch:
+    def __init__(self, ctx: mgl.Context, res: tuple[int, int], source: tuple[str, str],
+                 sprites: list[pg.Surface], capacity: int = BATCH_CAPACITY):
         self.ctx = ctx
         self.res = res
+        # (vertex, fragment) shader, compiled by load
+        self.source = source
+        self.program = None
 
-        # mvp
-        self.m_proj = glm.perspective(glm.radians(FOV), self.res[0]/self.res[1], NEAR, FAR)
-        self.m_view = glm.lookAt(glm.vec3(0, 0, 1), glm.vec3(0), glm.vec3(0, 1, 0))
+        # atlas, every sprite gets a square cell in a single strip
+        self.num_sprites = len(sprites)
+        self.atlas = self.get_atlas(sprites)
 
-        # shader programs
-        self.programs : dict[str, mgl.Program] = {}
-        self.load_all_shaders()
-        # self.programs['default'] = self.get_program('default')
-        # self.programs['circle'] = self.get_program('circle')
+        self.quad_vbo = make_quad_vbo(self.ctx)
 
-        # vertex buffer objects
-        self.vbo = self.get_vbo()
-
-        # vertex array objects
-        self.vaos = {}
-        self.get_all_vaos()
+        # per-instance data
+        self.capacity = 0
+        self.instance_vbo = None
+        self.vao = None
+        self.reserve(capacity)
+        self.instances : list['np.ndarray'] = []
+        self.num_instances = 0
 
+        # offscreen target the batch draws into
         self.texture = None
+        self.framebuffer = None
+        self.resize(self.res)
+
+    def resize(self, size: tuple[int, int]):
+        # the target can be smaller than res, positions stay in res pixels and the draw is scaled down
+        if self.texture:
+            self.framebuffer.release()
+            self.texture.release()
+        self.texture = self.ctx.texture(size=size, components=4)
+        self.texture.repeat_x = False
+        self.texture.repeat_y = False
+        # a scaled down target is filtered when it is stretched back over the screen
+        if tuple(size) == tuple(self.res):
+            self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        else:
+            self.texture.filter = (mgl.LINEAR, mgl.LINEAR)
+        self.framebuffer = self.ctx.framebuffer(color_attachments=[self.texture])
+
+    def get_atlas(self, sprites: list[pg.Surface]) -> mgl.Texture:
+        cell = max(max(sprite.get_size()) for sprite in sprites)
+        atlas_surf = pg.Surface((cell * len(sprites), cell), pg.SRCALPHA)
+        atlas_surf.fill((0, 0, 0, 0))
+        for i, sprite in enumerate(sprites):
+            # colorkeyed pixels stay transparent
+            atlas_surf.blit(pg.transform.scale(sprite, (cell, cell)), (i * cell, 0))
+        atlas = self.ctx.texture(size=atlas_surf.get_size(), components=4,
+                                 data=pg.image.tobytes(atlas_surf, 'RGBA'))
+        atlas.repeat_x = False
+        atlas.repeat_y = False
+        atlas.filter = (mgl.LINEAR, mgl.LINEAR)
+        return atlas
+
+    def load(self):
+        # compiles the program, on the first render unless it was warmed up before
+        if self.program:
+            return
+        vertex_shader, frag_shader = self.source
+        self.program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=frag_shader)
+        self.program['res'].write(glm.vec2(self.res[0], self.res[1]))
+        self.program['num_sprites'] = self.num_sprites
+        self.program['atlas'] = 0
+        self.create_vao()
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        self.capacity = max(capacity, 2 * self.capacity)
+        if self.instance_vbo:
+            self.instance_vbo.release()
+        self.instance_vbo = self.ctx.buffer(reserve=self.capacity * INSTANCE_DTYPE.itemsize, dynamic=True)
+        if self.program:
+            self.create_vao()
+
+    def create_vao(self):
+        if self.vao:
+            self.vao.release()
+        self.vao = self.ctx.vertex_array(self.program, [
+            (self.quad_vbo, '2f', 'vertcoord'),
+            (self.instance_vbo, '2f 1f 4f 1f/i', 'in_pos', 'in_scale', 'in_color', 'in_sprite'),
+        ])
+
+    def begin(self):
+        self.instances = []
+        self.num_instances = 0
+
+    def add(self, pos: 'np.ndarray[np.float32]', scale: float, color: tuple[int, int, int],
+            sprite: int = 0, additive: bool = False):
+        # pos are screen pixels, scale is the half size in pixels, color is 0-255
+        pos = np.reshape(pos, (-1, 2))
+        instances = np.empty(pos.shape[0], dtype=INSTANCE_DTYPE)
+        instances['pos'] = pos
+        instances['scale'] = scale
+        instances['color'][:, :3] = np.asarray(color, dtype='f4') / 255
+        instances['color'][:, 3] = 0 if additive else 1
+        instances['sprite'] = sprite
+        self.instances.append(instances)
+        self.num_instances += instances.shape[0]
+
+    def render(self):
+        # hand back whatever target was bound, not every context has a screen
+        previous = self.ctx.fbo
+        self.framebuffer.use()
+        self.framebuffer.clear(0, 0, 0, 0)
+        if self.num_instances:
+            self.load()
+            self.reserve(self.num_instances)
+            self.instance_vbo.write(np.concatenate(self.instances))
+            self.atlas.use(location=0)
+            # premultiplied blending lets opaque and additive sprites share one draw call
+            self.ctx.blend_func = (mgl.ONE, mgl.ONE_MINUS_SRC_ALPHA)
+            self.vao.render(instances=self.num_instances)
+            self.ctx.blend_func = (mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA)
+        previous.use()
+
+    def destroy(self):
+        if self.program:
+            self.vao.release()
+            self.program.release()
+        self.instance_vbo.release()
+        self.quad_vbo.release()
+        self.atlas.release()
+        self.framebuffer.release()
+        self.texture.release()
+
+class ParticleBatch:
+    # sparks and their glows, built in the vertex shader from one instance per particle
+    def __init__(self, ctx: mgl.Context, res: tuple[int, int], source: tuple[str, str],
+                 capacity: int = PARTICLE_CAPACITY):
+        self.ctx = ctx
+        self.res = res
+        # compiled by load, like SpriteBatch
+        self.source = source
+        self.program = None
+
+        # kite corners as (along the direction in major axes, across it in minor axes)
+        kite = np.array([(-3/4, 0), (0, -1/2), (1/4, 0), (-3/4, 0), (1/4, 0), (0, 1/2)], dtype='f4')
+        self.kite_vbo = self.ctx.buffer(kite)
+        # the glow circle is cut out of the quad
+        self.quad_vbo = make_quad_vbo(self.ctx)
+
+        # per-instance data, shared by the spark and the glow draw
+        self.capacity = 0
+        self.instance_vbo = None
+        self.spark_vao = None
+        self.glow_vao = None
+        self.reserve(capacity)
+        self.instances : list['np.ndarray'] = []
+        self.num_instances = 0
+        # without it the glow draw is skipped
+        self.glow = True
+
+    def load(self):
+        if self.program:
+            return
+        vertex_shader, frag_shader = self.source
+        self.program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=frag_shader)
+        self.program['res'].write(glm.vec2(self.res[0], self.res[1]))
+        self.create_vaos()
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        self.capacity = max(capacity, 2 * self.capacity)
+        if self.instance_vbo:
+            self.instance_vbo.release()
+        self.instance_vbo = self.ctx.buffer(reserve=self.capacity * PARTICLE_DTYPE.itemsize, dynamic=True)
+        if self.program:
+            self.create_vaos()
+
+    def create_vaos(self):
+        if self.spark_vao:
+            self.spark_vao.release()
+            self.glow_vao.release()
+        instance_format = (self.instance_vbo, '2f 1f 1f 2f 1f/i', 'in_pos', 'in_angle', 'in_lifetime',
+                           'in_size', 'in_glow')
+        self.spark_vao = self.ctx.vertex_array(self.program, [(self.kite_vbo, '2f', 'vertcoord'), instance_format])
+        self.glow_vao = self.ctx.vertex_array(self.program, [(self.quad_vbo, '2f', 'vertcoord'), instance_format])
+
+    def begin(self):
+        self.instances = []
+        self.num_instances = 0
+
+    def add(self, pos: 'np.ndarray[np.float32]', angle: 'np.ndarray[np.float32]',
+            lifetime: 'np.ndarray[np.float32]', size: 'np.ndarray[np.float32]', glow: 'np.ndarray[bool]'):
+        # pos are screen pixels, size is the (minor, major) axis in pixels per second of lifetime left
+        pos = np.reshape(pos, (-1, 2))
+        instances = np.empty(pos.shape[0], dtype=PARTICLE_DTYPE)
+        instances['pos'] = pos
+        instances['angle'] = angle
+        instances['lifetime'] = lifetime
+        instances['size'] = size
+        instances['glow'] = glow
+        self.instances.append(instances)
+        self.num_instances += instances.shape[0]
+
+    def render(self, framebuffer: mgl.Framebuffer, bgra: bool = False):
+        # added on top of whatever framebuffer holds. bgra targets store their channels swapped
+        if not self.num_instances:
+            return
+        self.load()
+        self.reserve(self.num_instances)
+        self.instance_vbo.write(np.concatenate(self.instances))
+        order = [2, 1, 0] if bgra else [0, 1, 2]
+        self.program['spark_color'].write(glm.vec3(*(np.array(SPARK_COLOR)[order] / 255)))
+        self.program['glow_color'].write(glm.vec3(*(np.array(GLOW_COLOR)[order] / 255)))
+
+        previous = self.ctx.fbo
+        framebuffer.use()
+        self.ctx.blend_func = (mgl.ONE, mgl.ONE)
+        self.program['mode'] = 0
+        self.spark_vao.render(instances=self.num_instances)
+        if self.glow:
+            self.program['mode'] = 1
+            self.glow_vao.render(instances=self.num_instances)
+        self.ctx.blend_func = (mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA)
+        previous.use()
+
+    def destroy(self):
+        if self.program:
+            self.spark_vao.release()
+            self.glow_vao.release()
+            self.program.release()
+        self.instance_vbo.release()
+        self.kite_vbo.release()
+        self.quad_vbo.release()
+
+class TextureLayer:
+    # a texture that persists between frames for one surface. only the rows that changed since the
+    # last upload are sent, optionally through a ring of pixel buffers so the cpu never waits on the gpu
+    def __init__(self, ctx: mgl.Context, size: tuple[int, int], use_pbo: bool = False):
+        self.ctx = ctx
+        self.size = size
+        self.texture = self.ctx.texture(size=size, components=4)
+        self.texture.repeat_x = False
+        self.texture.repeat_y = False
+        self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.texture.swizzle = 'BGRA'
+        # lets batches draw into the uploaded surface before it is shaded
+        self.framebuffer = self.ctx.framebuffer(color_attachments=[self.texture])
+
+        # what the texture holds, as rows of packed pixels. None until the first upload
+        self.uploaded = None
+        self.changed = np.zeros((size[1], size[0]), dtype=bool)
+        self.pbos = [self.ctx.buffer(reserve=size[0] * size[1] * 4, dynamic=True)
+                     for i in range(PBO_COUNT)] if use_pbo else []
+        self.pbo_index = 0
+        self.bytes_uploaded = 0
+
+    def get_dirty_bands(self, pixels: 'np.ndarray[np.uint32]') -> list[tuple[int, int]]:
+        # [start, end) row ranges that differ from the texture
+        if self.uploaded is None:
+            return [(0, self.size[1])]
+        np.not_equal(pixels, self.uploaded, out=self.changed)
+        edges = np.flatnonzero(np.diff(self.changed.any(axis=1), prepend=False, append=False))
+        bands = []
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            if bands and start - bands[-1][1] < BAND_GAP:
+                bands[-1] = (bands[-1][0], end)
+            else:
+                bands.append((start, end))
+        return bands
+
+    def upload(self, surf: pg.Surface):
+        # rows are (height, width) of packed pixels in the surface's own byte order
+        pixels = np.asarray(surf.get_view('2')).T
+        bands = self.get_dirty_bands(pixels)
+        for start, end in bands:
+            band = pixels[start:end]
+            viewport = (0, start, self.size[0], end - start)
+            if self.pbos:
+                pbo = self.pbos[self.pbo_index]
+                self.pbo_index = (self.pbo_index + 1) % len(self.pbos)
+                # orphaned so the driver hands back fresh storage instead of waiting on the last upload
+                pbo.orphan()
+                pbo.write(band)
+                self.texture.write(pbo, viewport=viewport)
+            else:
+                self.texture.write(band, viewport=viewport)
+            self.bytes_uploaded += band.nbytes
+        if self.uploaded is None:
+            self.uploaded = pixels.copy()
+        else:
+            for start, end in bands:
+                self.uploaded[start:end] = pixels[start:end]
+
+    def invalidate(self):
+        # something was drawn into the texture on the gpu, the next upload sends everything
+        self.uploaded = None
+
+    def destroy(self):
+        [pbo.release() for pbo in self.pbos]
+        self.framebuffer.release()
+        self.texture.release()
 
-    def get_vbo(self) -> mgl.Buffer:
-        vertex_data = self.get_vertex_data()
-        vbo = self.ctx.buffer(vertex_data)
-        return vbo
-    
-    def get_vertex_data(self) -> 'np.ndarray[np.float32]':
-        vertices = [(-1, 1), (1, 1), (1, -1), (-1, -1)]
-        tex_vert = [(0, 0), (1, 0), (1, 1), (0, 1)]
-        indices = [(0, 1, 2), (0, 2, 3)]
-
-        vertex_data = np.hstack([self.get_data(vertices, indices), 
-                                 self.get_data(tex_vert, indices)])
-        return np.hstack(vertex_data)
-    
-    @staticmethod
-    def get_data(vertices: list[tuple[float, float]], indices: 
-                 list[tuple[float, float, float]]) -> 'np.ndarray[np.float32]':
-        data = [vertices[ind] for triangle in indices for ind in triangle]
-        return np.array(data, dtype='f4')
-
-    def load_all_shaders(self, path='./src/pymgl/shaders'):
-        shaders = os.listdir(path)
-        for shader in shaders:
-            shader_name = shader.split('.')
-            if shader_name[1] == 'vert':
-                self.programs[shader_name[0]] = self.get_program(shader_name[0])
-
-    def get_program(self, shader_name: str) -> mgl.Program:
-        with open(f'./src/pymgl/shaders/{shader_name}.vert') as file:
+def get_blur_taps(radius: int) -> tuple['np.ndarray[np.float32]', 'np.ndarray[np.float32]']:
+    # (offsets, weights) of a normalized gaussian, neighbouring texels merged into one linear tap
+    sigma = max(radius / 2, 0.5)
+    weights = np.exp(-np.arange(radius + 1) ** 2 / (2 * sigma * sigma))
+    weights /= weights[0] + 2 * weights[1:].sum()
+    offsets = [0.0]
+    tap_weights = [weights[0]]
+    for i in range(1, radius + 1, 2):
+        pair = weights[i:i + 2]
+        offsets.append(float(np.dot(np.arange(i, i + pair.shape[0]), pair) / pair.sum()))
+        tap_weights.append(pair.sum())
+    return np.array(offsets, dtype='f4'), np.array(tap_weights, dtype='f4')
+
+class Bloom:
+    # blurs a texture at falling resolutions and adds every level back onto it. each level is
+    # downsampled from the one above, then blurred horizontally and vertically
+    def __init__(self, ctx: mgl.Context, res: tuple[int, int], downsample_source: tuple[str, str],
+                 upsample_source: tuple[str, str], blur_source: tuple[str, str], levels: int = BLOOM_LEVELS,
+                 radius: int = BLOOM_RADIUS, intensity: float = BLOOM_INTENSITY):
+        self.ctx = ctx
+        self.res = res
+        # compiled by load, like SpriteBatch
+        self.downsample_source = downsample_source
+        self.upsample_source = upsample_source
+        self.blur_source = blur_source
+        self.downsample_program = None
+        self.upsample_program = None
+
+        self.quad_vbo = make_quad_vbo(self.ctx)
+        # radius -> (program, vao), the taps are compiled in so the loop has a fixed length
+        self.blur_variants : dict[int, tuple[mgl.Program, mgl.VertexArray]] = {}
+
+        # (texture, framebuffer) pairs, every level has a target and a scratch for the first pass
+        self.targets : list[tuple[mgl.Texture, mgl.Framebuffer]] = []
+        self.scratch : list[tuple[mgl.Texture, mgl.Framebuffer]] = []
+        self.levels = 0
+        self.intensity = intensity
+        self.configure(levels, radius)
+
+    def load(self):
+        if self.downsample_program:
+            return
+        for name in ('downsample', 'upsample'):
+            vertex_shader, frag_shader = getattr(self, f'{name}_source')
+            program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=frag_shader)
+            program['tex'] = 0
+            setattr(self, f'{name}_program', program)
+            setattr(self, f'{name}_vao', make_quad_vao(self.ctx, program, self.quad_vbo))
+        self.get_blur_variant(self.radius)
+
+    def get_blur_variant(self, radius: int) -> tuple[mgl.Program, mgl.VertexArray]:
+        if radius not in self.blur_variants:
+            offsets, weights = get_blur_taps(radius)
+            vertex_shader, frag_shader = self.blur_source
+            frag_shader = inject_defines(frag_shader, {
+                'NUM_TAPS': offsets.shape[0],
+                'OFFSETS': ', '.join(f'{offset:.6f}' for offset in offsets.tolist()),
+                'WEIGHTS': ', '.join(f'{weight:.6f}' for weight in weights.tolist()),
+            })
+            program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=frag_shader)
+            program['tex'] = 0
+            vao = make_quad_vao(self.ctx, program, self.quad_vbo)
+            self.blur_variants[radius] = (program, vao)
+        return self.blur_variants[radius]
+
+    def get_target(self, size: tuple[int, int]) -> tuple[mgl.Texture, mgl.Framebuffer]:
+        texture = self.ctx.texture(size=size, components=4)
+        texture.repeat_x = False
+        texture.repeat_y = False
+        texture.filter = (mgl.LINEAR, mgl.LINEAR)
+        return texture, self.ctx.framebuffer(color_attachments=[texture])
+
+    def release_targets(self):
+        for texture, framebuffer in self.targets + self.scratch:
+            framebuffer.release()
+            texture.release()
+        self.targets = []
+        self.scratch = []
+
+    def configure(self, levels: int = None, radius: int = None, intensity: float = None):
+        if intensity is not None:
+            self.intensity = intensity
+        if radius is not None:
+            self.radius = radius
+        if levels is not None and levels != self.levels:
+            self.levels = levels
+            self.create_targets()
+
+    def resize(self, res: tuple[int, int]):
+        # res is the size of the texture the bloom is applied to
+        self.res = res
+        self.create_targets()
+
+    def create_targets(self):
+        self.release_targets()
+        for level in range(1, self.levels + 1):
+            size = (max(self.res[0] >> level, 1), max(self.res[1] >> level, 1))
+            self.targets.append(self.get_target(size))
+            self.scratch.append(self.get_target(size))
+
+    def apply(self, texture: mgl.Texture, framebuffer: mgl.Framebuffer = None) -> mgl.Texture:
+        # the bloom of texture, every level added up at the first level's size. with the framebuffer
+        # that draws into texture, it is also added onto texture
+        if not self.levels:
+            return None
+        self.load()
+        blur_program, blur_vao = self.get_blur_variant(self.radius)
+        previous = self.ctx.fbo
+        self.ctx.disable(mgl.BLEND)
+        source = texture
+        for (target, target_fbo), (scratch, scratch_fbo) in zip(self.targets, self.scratch):
+            target_fbo.use()
+            source.use(location=0)
+            self.downsample_vao.render()
+            # horizontal into scratch, vertical back into the level
+            scratch_fbo.use()
+            target.use(location=0)
+            blur_program['direction'] = (1.0, 0.0)
+            blur_vao.render()
+            target_fbo.use()
+            scratch.use(location=0)
+            blur_program['direction'] = (0.0, 1.0)
+            blur_vao.render()
+            source = target
+
+        # every level is added into the one above it, so the full size texture is drawn into once at most
+        self.ctx.enable(mgl.BLEND)
+        self.ctx.blend_func = (mgl.ONE, mgl.ONE)
+        self.upsample_program['scale'] = 1.0
+        for level in range(self.levels - 1, 0, -1):
+            self.targets[level - 1][1].use()
+            self.targets[level][0].use(location=0)
+            self.upsample_vao.render()
+        if framebuffer:
+            framebuffer.use()
+            self.upsample_program['scale'] = self.intensity
+            self.targets[0][0].use(location=0)
+            self.upsample_vao.render()
+        self.ctx.blend_func = (mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA)
+        if previous:
+            previous.use()
+        return self.targets[0][0]
+
+    def destroy(self):
+        self.release_targets()
+        for program, vao in self.blur_variants.values():
+            vao.release()
+            program.release()
+        if self.downsample_program:
+            self.downsample_vao.release()
+            self.upsample_vao.release()
+            self.downsample_program.release()
+            self.upsample_program.release()
+        self.quad_vbo.release()
+
+class GraphicsEngine:
+    def __init__(self, ctx: mgl.Context, res: tuple[int, int], use_pbo: bool = False):
+        self.ctx = ctx
+        self.res = res
+        self.use_pbo = use_pbo
+        # the sprite batches and blooms draw at render_res and are stretched back over res
+        self.render_scale = 1.0
+        self.render_res = res
+        self.quality = DEFAULT_QUALITY
+
+        # compiles to get out of the way before they are needed, see warm_up
+        self.warmups : list[callable] = []
+
+        # one persistent texture per surface that gets uploaded
+        self.layers : dict[str, TextureLayer] = {}
+        self.sprite_batches : list[SpriteBatch] = []
+        self.particle_batches : list[ParticleBatch] = []
+        self.blooms : list[Bloom] = []
+        self.compositor = self.create_compositor()
+
+    def queue_warmup(self, warmup: callable):
+        self.warmups.append(warmup)
+
+    def warm_up(self, budget: float) -> bool:
+        # runs queued compiles for up to budget seconds, at least one. True once the queue is empty
+        start = time.perf_counter()
+        while self.warmups:
+            self.warmups.pop(0)()
+            if time.perf_counter() - start >= budget:
+                break
+        return not self.warmups
+
+    def get_shader_source(self, shader_name: str) -> tuple[str, str]:
+        with open(f'{SHADER_PATH}/{shader_name}.vert') as file:
             vertex_shader = file.read()
-        with open(f'./src/pymgl/shaders/{shader_name}.frag') as file:
+        with open(f'{SHADER_PATH}/{shader_name}.frag') as file:
             frag_shader = file.read()
+        return vertex_shader, frag_shader
 
-        program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=frag_shader)
-        program['res'].write(glm.vec2(self.res[0], self.res[1]))
-        m_model = glm.mat4()
-
-        # translate
-        pos = (0, 0, 0)
-        m_model = glm.translate(m_model, pos)
-
-        # scale
-        scale = (1, 1, 1)
-        m_model = m_model * glm.scale(scale)
-
-        # write
-        program['m_model'].write(m_model)
-
-        return program
-
-    def get_all_vaos(self):
-        for program_name in self.programs:
-            self.vaos[program_name] = self.get_vao(self.programs[program_name], self.vbo)
-
-    def get_vao(self, program: mgl.Program, vbo: mgl.Buffer):
-        return self.ctx.vertex_array(program, [(vbo, '2f 2f', 'vertcoord', 'texcoord')])
-    
-    def update_texture(self, surf_size: tuple[int, int], surf: pg.Surface):
-        # if self.texture:
-        #     self.texture.release()
-        # self.texture = self.ctx.texture(size=surf_size, components=4)
-        # self.texture.repeat_x = False
-        # self.texture.repeat_y = False
-        # self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
-        # self.texture.swizzle = 'BGRA'
-        if not self.texture:
-            self.texture = self.ctx.texture(size=surf_size, components=4)
-            self.texture.repeat_x = False
-            self.texture.repeat_y = False
-            self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
-            self.texture.swizzle = 'BGRA'
-        self.texture.write(surf.get_view('1'))
-        self.texture.use()
-    
-    def write_program_data(self, shader: str, render_data: dict[str, any]):
-        for key in render_data:
-            self.programs[shader][key].write(render_data[key])
-
-    def write_model_data(self, shader: str, rect: pg.Rect):
-        width, height = self.res
-        m_model = glm.mat4()
-
-        # translate
-        pos = (rect.centerx/width*2-1, -(rect.centery/height*2-1), 0)
-        m_model = glm.translate(m_model, pos)
-
-        # scale
-        scale = (rect.width/width, rect.height/height, 1)
-        m_model = m_model * glm.scale(scale)
-
-        # write
-        self.programs[shader]['m_model'].write(m_model)
-
-    def render(self, surf: pg.Surface, rect: pg.Surface, render_data: dict[str, any]={}, shader: str='default'):
-        surf_size = surf.get_size()
-        self.update_texture(surf_size, surf)
-        self.programs[shader]['tex'] = 0
-        # self.write_model_data(shader, rect)
-        # self.write_program_data(shader, render_data)
-        vao = self.vaos[shader]
-        vao.render()
+    def get_layer(self, layer: str, size: tuple[int, int]) -> TextureLayer:
+        if layer in self.layers and self.layers[layer].size != size:
+            self.layers.pop(layer).destroy()
+        if layer not in self.layers:
+            self.layers[layer] = TextureLayer(self.ctx, size, self.use_pbo)
+        return self.layers[layer]
+
+    def get_bytes_uploaded(self) -> int:
+        # every byte sent to any layer so far
+        return sum(layer.bytes_uploaded for layer in self.layers.values())
+
+    def add_surface_layer(self, layer: str, surf: pg.Surface, z: int, effect: str = 'default',
+                          blend: str = 'alpha', rect: pg.Rect = None, particle_batch: ParticleBatch = None):
+        # uploads surf into its layer and composites it this frame, a sub-rect layer is only as big as surf.
+        # particle_batch is drawn into the layer after the upload, before it is shaded
+        texture_layer = self.get_layer(layer, surf.get_size())
+        texture_layer.upload(surf)
+        if particle_batch and particle_batch.num_instances:
+            # the surface's bytes are bgra, the swizzle only applies when sampling
+            particle_batch.render(texture_layer.framebuffer, bgra=True)
+            texture_layer.invalidate()
+        self.compositor.add_layer(layer, texture_layer.texture, z, effect, blend, rect)
+
+    def create_sprite_batch(self, sprites: list[pg.Surface], capacity: int = BATCH_CAPACITY) -> SpriteBatch:
+        # the batches and blooms compile on first use, or earlier if warm_up gets to them
+        sprite_batch = SpriteBatch(self.ctx, self.res, self.get_shader_source('instanced/sprite'), sprites, capacity)
+        if self.render_res != self.res:
+            sprite_batch.resize(self.render_res)
+        self.sprite_batches.append(sprite_batch)
+        self.queue_warmup(sprite_batch.load)
+        return sprite_batch
+
+    def create_particle_batch(self, capacity: int = PARTICLE_CAPACITY) -> ParticleBatch:
+        particle_batch = ParticleBatch(self.ctx, self.res, self.get_shader_source('instanced/spark'), capacity)
+        particle_batch.glow = self.get_quality()['glow']
+        self.particle_batches.append(particle_batch)
+        self.queue_warmup(particle_batch.load)
+        return particle_batch
+
+    def create_bloom(self, levels: int = None, radius: int = None,
+                     intensity: float = BLOOM_INTENSITY) -> Bloom:
+        # levels and radius follow the quality preset when they are not given
+        quality = self.get_quality()
+        levels = quality['bloom_levels'] if levels is None else levels
+        radius = quality['bloom_radius'] if radius is None else radius
+        bloom = Bloom(self.ctx, self.render_res, self.get_shader_source('bloom/downsample'),
+                      self.get_shader_source('bloom/upsample'), self.get_shader_source('bloom/blur'),
+                      levels, radius, intensity)
+        self.blooms.append(bloom)
+        self.queue_warmup(bloom.load)
+        return bloom
+
+    def get_quality(self) -> dict:
+        return QUALITY_PRESETS[self.quality]
+
+    def set_quality(self, quality: str):
+        # the blur taps of each radius are a shader variant of their own, the first switch to a
+        # preset compiles its variant unless warm_quality has queued it
+        self.quality = quality
+        preset = self.get_quality()
+        [bloom.configure(preset['bloom_levels'], preset['bloom_radius']) for bloom in self.blooms]
+        for particle_batch in self.particle_batches:
+            particle_batch.glow = preset['glow']
+
+    def warm_quality(self):
+        # queues the blur variant of every preset for every bloom
+        for bloom in self.blooms:
+            for preset in QUALITY_PRESETS.values():
+                self.queue_warmup(lambda bloom=bloom, radius=preset['bloom_radius'] : bloom.get_blur_variant(radius))
+
+    def set_render_scale(self, scale: float):
+        # resizes every offscreen target the game world is drawn into, the surfaces and the window keep res
+        scale = min(max(scale, MIN_RENDER_SCALE), 1.0)
+        if scale == self.render_scale:
+            return
+        self.render_scale = scale
+        self.render_res = (max(round(self.res[0] * scale), 1), max(round(self.res[1] * scale), 1))
+        [sprite_batch.resize(self.render_res) for sprite_batch in self.sprite_batches]
+        [bloom.resize(self.render_res) for bloom in self.blooms]
+
+    def create_compositor(self) -> Compositor:
+        vertex_shader, frag_shader = self.get_shader_source('compositor/composite')
+        return Compositor(self.ctx, self.res, vertex_shader, frag_shader)
 
     def destroy(self):
-        self.texture.release()
-        self.vbo.release()
-        [program.release() for program in self.programs.values()]
\ No newline at end of file
+        self.compositor.destroy()
+        [texture_layer.destroy() for texture_layer in self.layers.values()]
+        [sprite_batch.destroy() for sprite_batch in self.sprite_batches]
+        [particle_batch.destroy() for particle_batch in self.particle_batches]
+        [bloom.destroy() for bloom in self.blooms]
\ No newline at end of file
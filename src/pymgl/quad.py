@@ -0,0 +1,13 @@
+import moderngl as mgl
+import numpy as np
+
+# two triangles covering clip space, drawn with the 'vertcoord' attribute. fullscreen passes use it
+# as is, the instanced batches scale it per instance
+QUAD = np.array([(-1, -1), (1, -1), (1, 1), (-1, -1), (1, 1), (-1, 1)], dtype='f4')
+
+def make_quad_vbo(ctx: mgl.Context) -> mgl.Buffer:
+    return ctx.buffer(QUAD)
+
+def make_quad_vao(ctx: mgl.Context, program: mgl.Program, quad_vbo: mgl.Buffer) -> mgl.VertexArray:
+    # a fullscreen pass of program over quad_vbo
+    return ctx.vertex_array(program, [(quad_vbo, '2f', 'vertcoord')])
@@ -0,0 +1,30 @@
+#version 330 core
+
+// the bloom defines NUM_TAPS, OFFSETS and WEIGHTS for its radius, so the loop has a fixed length
+#ifndef NUM_TAPS
+#define NUM_TAPS 1
+#define OFFSETS 0.0
+#define WEIGHTS 1.0
+#endif
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uvs;
+
+uniform sampler2D tex;
+// one texel along the pass, horizontal or vertical
+uniform vec2 direction;
+
+// tap 0 is the center, every other tap sits between two texels so linear filtering reads both
+const float offsets[NUM_TAPS] = float[] (OFFSETS);
+const float weights[NUM_TAPS] = float[] (WEIGHTS);
+
+void main() {
+    vec2 texel = direction / textureSize(tex, 0);
+    vec4 color = texture(tex, uvs) * weights[0];
+    for (int i = 1; i < NUM_TAPS; i++) {
+        color += texture(tex, uvs + texel * offsets[i]) * weights[i];
+        color += texture(tex, uvs - texel * offsets[i]) * weights[i];
+    }
+    fragColor = color;
+}
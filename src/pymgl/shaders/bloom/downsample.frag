@@ -0,0 +1,17 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uvs;
+
+uniform sampler2D tex;
+
+void main() {
+    // four taps half a source texel apart, the average of the 2x2 block under a target texel
+    vec2 half_texel = 0.5 / textureSize(tex, 0);
+    vec4 color = texture(tex, uvs + vec2(-half_texel.x, -half_texel.y));
+    color += texture(tex, uvs + vec2(half_texel.x, -half_texel.y));
+    color += texture(tex, uvs + vec2(-half_texel.x, half_texel.y));
+    color += texture(tex, uvs + vec2(half_texel.x, half_texel.y));
+    fragColor = color * 0.25;
+}
@@ -0,0 +1,10 @@
+#version 330 core
+
+layout (location = 0) in vec2 vertcoord;
+
+out vec2 uvs;
+
+void main() {
+    uvs = vertcoord * 0.5 + 0.5;
+    gl_Position = vec4(vertcoord, 0.0, 1.0);
+}
@@ -0,0 +1,13 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uvs;
+
+uniform sampler2D tex;
+uniform float scale;
+
+void main() {
+    // linear filtering stretches the smaller level smoothly
+    fragColor = texture(tex, uvs) * scale;
+}
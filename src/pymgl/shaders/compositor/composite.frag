@@ -0,0 +1,100 @@
+#version 330 core
+
+#define TAU 6.2831855
+#define MAX_LAYERS 4
+
+// effects, the same looks as the standalone shaders of the same name
+#define EFFECT_DEFAULT 0
+#define EFFECT_SYNTH_ALL 1
+#define EFFECT_SYNTH_WHITE 2
+// the bloom added onto the layer, see-through where the sum is dark
+#define EFFECT_GLOW 3
+
+#define BLEND_ALPHA 0
+#define BLEND_ADDITIVE 1
+
+// the compositor defines NUM_LAYERS and every layer's LAYERi_EFFECT and LAYERi_BLEND, so each
+// stack of layers gets its own program without branches on the effect
+#ifndef NUM_LAYERS
+#define NUM_LAYERS 0
+#endif
+
+layout (location = 0) out vec4 fragColor;
+
+uniform vec2 res;
+// one slot per layer, sorted by z on the cpu
+uniform sampler2D layer0;
+uniform sampler2D layer1;
+uniform sampler2D layer2;
+uniform sampler2D layer3;
+// x, y, width, height in screen pixels with y down
+uniform vec4 rect[MAX_LAYERS];
+// blurred copy of the glow layer, at any size
+uniform sampler2D bloom;
+uniform float bloom_intensity;
+
+vec3 synth(vec3 color, vec2 st) {
+    float dist_from_center = distance(gl_FragCoord.xy, 0.5 * vec2(res.x, res.y*5.0/4.0));
+    if (dist_from_center > 0.3 * res.y || st.y < 0.5) {
+        // background gradient
+        return vec3(1.1-st.y, st.y - 0.4, 0.9) * color;
+    }
+    // gradient sun
+    if (st.y < 2.5/4.0 && sin(25.0 * TAU * (2.5/4.0-st.y)) > 0) {
+        return vec3(1.1-st.y, st.y - 0.4, 0.9) * color;
+    }
+    return vec3(1.0, st.y-0.2, st.y-0.5) * color;
+}
+
+vec4 shade(sampler2D tex, int layer_effect, vec4 layer_rect) {
+    // layers keep the row order of the surfaces they came from
+    vec2 pixel = vec2(gl_FragCoord.x, res.y - gl_FragCoord.y);
+    vec2 uvs = (pixel - layer_rect.xy) / layer_rect.zw;
+    if (any(lessThan(uvs, vec2(0.0))) || any(greaterThanEqual(uvs, vec2(1.0)))) {
+        return vec4(0.0);
+    }
+
+    vec2 st = gl_FragCoord.xy / res;
+    vec3 color = texture(tex, uvs).rgb;
+    if (layer_effect == EFFECT_SYNTH_ALL) {
+        return vec4(synth(color, st), 1.0);
+    }
+    if (layer_effect == EFFECT_SYNTH_WHITE) {
+        if (color.r + color.g + color.b == 3.0) {
+            color = synth(color, st);
+        }
+        return vec4(color, 1.0);
+    }
+    if (layer_effect == EFFECT_GLOW) {
+        color += texture(bloom, uvs).rgb * bloom_intensity;
+        return vec4(color, color.r + color.g + color.b);
+    }
+    // black is see-through
+    return vec4(color, color.r + color.g + color.b == 0.0 ? 0.0 : 1.0);
+}
+
+vec3 composite(vec3 dst, vec4 src, int layer_blend) {
+    // the same clamping the framebuffer applies between separate draws
+    src = clamp(src, 0.0, 1.0);
+    if (layer_blend == BLEND_ADDITIVE) {
+        return min(dst + src.rgb, 1.0);
+    }
+    return mix(dst, src.rgb, src.a);
+}
+
+void main() {
+    vec3 color = vec3(0.0);
+#if NUM_LAYERS > 0
+    color = composite(color, shade(layer0, LAYER0_EFFECT, rect[0]), LAYER0_BLEND);
+#endif
+#if NUM_LAYERS > 1
+    color = composite(color, shade(layer1, LAYER1_EFFECT, rect[1]), LAYER1_BLEND);
+#endif
+#if NUM_LAYERS > 2
+    color = composite(color, shade(layer2, LAYER2_EFFECT, rect[2]), LAYER2_BLEND);
+#endif
+#if NUM_LAYERS > 3
+    color = composite(color, shade(layer3, LAYER3_EFFECT, rect[3]), LAYER3_BLEND);
+#endif
+    fragColor = vec4(color, 1.0);
+}
@@ -0,0 +1,7 @@
+#version 330 core
+
+layout (location = 0) in vec2 vertcoord;
+
+void main() {
+    gl_Position = vec4(vertcoord, 0.0, 1.0);
+}
@@ -0,0 +1,20 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 local;
+
+uniform int mode;
+uniform vec3 spark_color;
+uniform vec3 glow_color;
+
+void main() {
+    if (mode == 0) {
+        fragColor = vec4(spark_color, 1.0);
+    } else {
+        if (dot(local, local) > 1.0) {
+            discard;
+        }
+        fragColor = vec4(glow_color, 1.0);
+    }
+}
@@ -0,0 +1,35 @@
+#version 330 core
+
+layout (location = 0) in vec2 vertcoord;
+layout (location = 1) in vec2 in_pos;
+layout (location = 2) in float in_angle;
+layout (location = 3) in float in_lifetime;
+layout (location = 4) in vec2 in_size;
+layout (location = 5) in float in_glow;
+
+uniform vec2 res;
+// 0 draws the sparks, 1 draws the glows around them
+uniform int mode;
+
+out vec2 local;
+
+void main() {
+    // sparks shrink with the lifetime they have left
+    vec2 size = in_size * in_lifetime;
+    vec2 direction = vec2(cos(in_angle), sin(in_angle));
+    vec2 norm = vec2(-direction.y, direction.x);
+
+    vec2 offset;
+    if (mode == 0) {
+        // vertcoord is a kite corner, x along the direction in major axes, y across it in minor axes
+        offset = direction * vertcoord.x * size.y + norm * vertcoord.y * size.x;
+    } else {
+        // vertcoord is a quad corner, the glow's radius is the major axis. no glow collapses the quad
+        offset = vertcoord * size.y * in_glow;
+    }
+    local = vertcoord;
+
+    // mapped to clip space like sprite.vert
+    vec2 pixel = in_pos + offset;
+    gl_Position = vec4(pixel / res * 2.0 - 1.0, 0.0, 1.0);
+}
@@ -0,0 +1,14 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uvs;
+in vec4 color;
+
+uniform sampler2D atlas;
+
+void main() {
+    vec4 sprite = texture(atlas, uvs);
+    // premultiplied output, color.a = 1 draws over, color.a = 0 adds
+    fragColor = vec4(sprite.rgb * color.rgb * sprite.a, sprite.a * color.a);
+}
@@ -0,0 +1,24 @@
+#version 330 core
+
+layout (location = 0) in vec2 vertcoord;
+layout (location = 1) in vec2 in_pos;
+layout (location = 2) in float in_scale;
+layout (location = 3) in vec4 in_color;
+layout (location = 4) in float in_sprite;
+
+uniform vec2 res;
+uniform float num_sprites;
+
+out vec2 uvs;
+out vec4 color;
+
+void main() {
+    // pick the sprite's cell in the atlas strip
+    vec2 cell_uv = vertcoord * 0.5 + 0.5;
+    uvs = vec2((in_sprite + cell_uv.x) / num_sprites, cell_uv.y);
+    color = in_color;
+
+    // pixel coords with y down, same row order as an uploaded pygame surface
+    vec2 pixel = in_pos + vertcoord * in_scale;
+    gl_Position = vec4(pixel / res * 2.0 - 1.0, 0.0, 1.0);
+}
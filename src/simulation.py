@@ -0,0 +1,199 @@
+import pygame as pg
+import numpy as np
+import math
+
+from .entities.entity import Player, Enemies
+from .entities.bullet import BulletPool
+from .entities.particles import ParticlePool
+from .util.input_log import PAUSED, TRANSITION
+from .util.rng import reseed, get_stream
+
+SCREEN_SHAKE = 0.5
+ENTER_BULLET_TIME = 0.25
+
+class Simulation:
+    # the in-game rules with no window, gl context or mixer behind them.
+    # InGame renders on top of this and the headless driver runs it on its own
+    def __init__(self, game):
+        # from Game class, or anything with the same score, sound and input fields
+        self.game = game
+        self.resolution = game.resolution
+        self.sfx = game.sfx
+        self.sound_system = game.sound_system
+        self.input = game.input_source
+
+        self.show_tutorial = True
+        self.boundary_radius = 1000
+
+        self.show_pause = False
+        self.paused = False
+        # share of the sparks every burst makes, the particles draw from a stream of their own
+        self.particle_density = 1.0
+
+        # constants
+        self.resolve_interval = 1
+
+    def on_load(self, seed: int = None):
+        # every run gets its own seed, so a recording of its input reproduces it
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed = seed
+        reseed(seed)
+        # leaps acted on since the last recorded frame
+        self.frame_leaps = 0
+        # flags of the frame being played back, None when the input is live
+        self.playback_flags = None
+
+        self.particles = ParticlePool(density=self.particle_density)
+        self.bullets = BulletPool()
+        # particle groups are emitters, every burst lands in the one pool
+        add_particle_group = lambda particle_group : particle_group.emit(self.particles)
+        self.player = Player((0, 0), add_particle_group, self.sfx, self.sound_system)
+        self.enemies = Enemies(5, self.bullets.add_bullets, add_particle_group,
+                               self.show_tutorial)
+
+        # game state management
+        self.resolve_enemy_actions = False
+        self.time_spent_in_bullet_time = 0
+        self.resolve_time = 0
+        self.enter_bullet_time_time = 0
+        self.screen_shake = 0
+        self.shake_offset = [0, 0]
+
+        self.transitioning = True
+        self.show_pause = False
+
+        # app state management
+        self.game.score = 0
+        self.game.kill_chain = 0
+        self.game.score_add = 100
+        self.countdown = 5
+        self.dead = False
+        self.death_countdown = 2
+
+    def handle_event(self, event: pg.Event):
+        if self.countdown <= 0 and not self.dead and not self.transitioning and not self.paused:
+            if event.type == pg.MOUSEBUTTONUP or (event.type == pg.KEYDOWN and event.key == pg.K_SPACE):
+                self.frame_leaps += 1
+                if self.player.bullet_time:
+                    kills = self.player.take_turn(self.enemies, self.boundary_radius)
+                    if kills != -1:
+                        if kills == 0:
+                            self.resolve_enemy_actions = True
+                        if self.resolve_enemy_actions:
+                            self.game.score_add = 100
+                            self.game.kill_chain = 0
+                        else:
+                            for i in range(kills):
+                                self.sound_system.queue_new_sound(self.sfx['kill'][self.game.kill_chain])
+                                self.game.score += self.game.score_add * (1 + self.game.minimum_bullet_time)
+                                self.game.score_add += 50
+                                self.game.kill_chain = min(self.game.kill_chain + 1, 4)
+                            self.time_spent_in_bullet_time = self.game.minimum_bullet_time
+                        self.screen_shake = SCREEN_SHAKE
+
+    def set_particle_density(self, density: float):
+        # takes effect from the next burst, the run in progress keeps its pool
+        self.particle_density = density
+        self.particles.density = density
+
+    def skip_countdown(self):
+        # straight into play
+        self.transitioning = False
+        self.countdown = 0
+
+    def resume(self):
+        self.paused = False
+        self.countdown = 5
+
+    def in_transition(self) -> bool:
+        # while a log plays back, the screen transition is wherever it was when recorded
+        if self.playback_flags is not None:
+            return bool(self.playback_flags & TRANSITION)
+        return bool(self.game.transition)
+
+    def play_frame(self, sim_dt: float) -> dict:
+        # the next frame of a PlaybackInput: its leaps, pause state and simulation steps
+        for event in self.input.get_events():
+            self.handle_event(event)
+        frame = self.input.current
+        self.playback_flags = int(frame['flags'])
+        if self.playback_flags & PAUSED:
+            self.paused = True
+        elif self.paused:
+            self.resume()
+        for i in range(int(frame['steps'])):
+            retval = self.step(sim_dt)
+            if retval:
+                return retval
+        return {}
+
+    def step(self, dt: float) -> dict:
+        # one fixed simulation step
+        if self.countdown <= 0 and not self.dead and not self.transitioning and not self.paused:
+            # these should not be influenced by bulletime
+            # screen shake
+            if self.screen_shake > 0:
+                self.screen_shake -= dt
+                self.shake_offset = get_stream('shake').uniform(-4, 4, 2).tolist()
+
+            self.particles.update(dt)
+
+            # enemies catch up from bullet time
+            if self.resolve_enemy_actions:
+                self.time_spent_in_bullet_time -= dt
+                self.enemies.update(dt, self.player.pos)
+                
+                if self.time_spent_in_bullet_time <= 0:
+                    self.time_spent_in_bullet_time = 0
+                    self.resolve_enemy_actions = False
+            # player is in bullet time or are entering bullet time
+            else:
+                self.time_spent_in_bullet_time += dt
+                if not self.player.bullet_time:
+                    self.enter_bullet_time_time += dt
+                    dt *= (1 - self.enter_bullet_time_time/ENTER_BULLET_TIME)/10
+                    if self.enter_bullet_time_time >= ENTER_BULLET_TIME:
+                        self.enter_bullet_time_time = 0
+                        # play a sound
+                        # flash the screen
+                        self.player.bullet_time = True
+
+            
+            if self.player.bullet_time:
+                dt /= 100
+            self.bullets.update(dt)
+
+            self.dead = self.player.check_hit(self.bullets)
+            
+            m_relpos = np.array(self.input.get_mouse_pos()) - np.array(self.resolution) * 0.5
+            self.player.update_shadow(math.atan2(m_relpos[1], m_relpos[0]))
+        elif self.transitioning:
+            # do nothing
+            self.transitioning = self.in_transition()
+        else:
+            if self.paused:
+                return {}
+            self.particles.update(dt)
+
+            if self.countdown > 0:
+                prev_count = self.countdown
+                self.countdown -= dt
+                if math.ceil(prev_count) != math.ceil(self.countdown):
+                    self.sound_system.queue_new_sound(self.sfx['countdown'])
+
+            if self.dead:
+                self.player.death(dt)
+                self.death_countdown -= dt
+                self.shake_offset = get_stream('shake').uniform(-4, 4, 2).tolist()
+                if self.death_countdown < 0:
+                    if not self.show_tutorial:
+                        self.game.highscore = max(self.game.highscore, self.game.score)
+                    else:
+                        self.show_tutorial = False
+                        self.transitioning = True
+                    return {
+                        'exit': False,
+                        'goto': 'replay'
+                    }
+        return {}
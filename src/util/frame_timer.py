@@ -0,0 +1,87 @@
+import numpy as np
+import time, functools
+
+FRAME_CAPACITY = 600
+PERCENTILES = (50, 95, 99)
+
+class FrameTimer:
+    # per phase wall time of the last FRAME_CAPACITY frames, in a ring buffer.
+    # phases can nest, a phase's time excludes the phases started inside it
+    def __init__(self, phases: list[str], capacity: int = FRAME_CAPACITY):
+        self.phases = list(phases)
+        self.phase_index = {phase: i for i, phase in enumerate(self.phases)}
+        self.samples = np.zeros((capacity, len(self.phases)), dtype=np.float64)
+        # row being filled, and how many rows hold finished frames
+        self.frame = 0
+        self.count = 0
+        # [phase index, start time, time spent in nested phases]
+        self.stack = []
+
+    def start(self, phase: str):
+        self.stack.append([self.phase_index[phase], time.perf_counter(), 0.0])
+
+    def stop(self):
+        index, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.samples[self.frame, index] += elapsed - nested
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def phase(self, phase: str) -> 'PhaseTimer':
+        return PhaseTimer(self, phase)
+
+    def timed(self, phase: str, func: callable) -> callable:
+        # func, with every call counted towards phase
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.start(phase)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stop()
+        return wrapper
+
+    def end_frame(self):
+        self.frame = (self.frame + 1) % self.samples.shape[0]
+        # the row being filled is never counted
+        self.count = min(self.count + 1, self.samples.shape[0] - 1)
+        self.samples[self.frame] = 0
+
+    def get_last_frame(self, exclude: tuple[str] = ()) -> float:
+        # seconds the last finished frame took, without the phases in exclude
+        if not self.count:
+            return 0.0
+        samples = self.samples[self.frame - 1]
+        return samples.sum() - sum(samples[self.phase_index[phase]] for phase in exclude)
+
+    def get_samples(self) -> 'np.ndarray[np.float64]':
+        # finished frames, oldest first
+        if self.count < self.samples.shape[0] - 1:
+            return self.samples[:self.count]
+        return np.roll(self.samples, -(self.frame + 1), axis=0)[:-1]
+
+    def get_percentiles(self, percentiles: tuple[float] = PERCENTILES) -> 'np.ndarray[np.float64]':
+        # (phase, percentile) in seconds, the last row is the whole frame
+        samples = self.get_samples()
+        if samples.shape[0] == 0:
+            return np.zeros((len(self.phases) + 1, len(percentiles)))
+        samples = np.hstack([samples, samples.sum(axis=1, keepdims=True)])
+        return np.percentile(samples, percentiles, axis=0).T
+
+    def export_csv(self, path: str):
+        # one row per frame in milliseconds, oldest first
+        samples = self.get_samples() * 1000
+        samples = np.hstack([samples, samples.sum(axis=1, keepdims=True)])
+        np.savetxt(path, samples, fmt='%.4f', delimiter=',', header=','.join(self.phases + ['frame']),
+                   comments='')
+
+class PhaseTimer:
+    def __init__(self, frame_timer: FrameTimer, phase: str):
+        self.frame_timer = frame_timer
+        self.phase = phase
+
+    def __enter__(self):
+        self.frame_timer.start(self.phase)
+
+    def __exit__(self, *exc_info):
+        self.frame_timer.stop()
@@ -0,0 +1,142 @@
+import pygame as pg
+import numpy as np
+import threading, queue, os
+
+# a log is one header followed by one fixed size record per frame, so frame i sits at
+# HEADER_DTYPE.itemsize + i * FRAME_DTYPE.itemsize and the file can be memory mapped
+MAGIC = b'HSJL'
+VERSION = 2
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('sim_rate', '<u2'),
+    ('seed', '<u8'),
+    ('resolution', '<u2', 2),
+    ('show_tutorial', 'u1'),
+    # the run started straight into play, without the transition and countdown
+    ('skip_countdown', 'u1'),
+    ('pad', 'u1', 2),
+    ('minimum_bullet_time', '<f4'),
+    # filled in when the recording is closed
+    ('frames', '<u8'),
+    ('score', '<f8'),
+])
+FRAME_DTYPE = np.dtype([
+    ('mouse', '<i2', 2),
+    # simulation steps run this frame
+    ('steps', 'u1'),
+    # leaps the simulation acted on this frame
+    ('leaps', 'u1'),
+    ('flags', 'u1'),
+    ('pad', 'u1'),
+])
+PAUSED = 1
+TRANSITION = 2
+
+# frames buffered before a chunk is handed to the writer thread
+CHUNK_FRAMES = 256
+
+class InputRecorder:
+    # appends frames to a log, the file is written on a background thread
+    def __init__(self, path: str, seed: int, sim_rate: int, resolution: tuple[int, int],
+                 show_tutorial: bool, minimum_bullet_time: float, skip_countdown: bool = False):
+        self.path = path
+        self.header = np.zeros(1, dtype=HEADER_DTYPE)
+        self.header['magic'] = MAGIC
+        self.header['version'] = VERSION
+        self.header['sim_rate'] = sim_rate
+        self.header['seed'] = seed
+        self.header['resolution'] = resolution
+        self.header['show_tutorial'] = show_tutorial
+        self.header['minimum_bullet_time'] = minimum_bullet_time
+        self.header['skip_countdown'] = skip_countdown
+
+        self.chunk = np.zeros(CHUNK_FRAMES, dtype=FRAME_DTYPE)
+        self.chunk_frames = 0
+        self.frames = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'wb')
+        self.file.write(self.header.tobytes())
+        self.chunks = queue.Queue()
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def write_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            self.file.write(chunk)
+
+    def add_frame(self, mouse_pos: tuple[float, float], steps: int, leaps: int, flags: int):
+        frame = self.chunk[self.chunk_frames]
+        frame['mouse'] = mouse_pos
+        frame['steps'] = steps
+        frame['leaps'] = leaps
+        frame['flags'] = flags
+        self.chunk_frames += 1
+        self.frames += 1
+        if self.chunk_frames == CHUNK_FRAMES:
+            self.flush()
+
+    def flush(self):
+        if self.chunk_frames:
+            self.chunks.put(self.chunk[:self.chunk_frames].tobytes())
+            self.chunk_frames = 0
+
+    def close(self, score: float):
+        self.flush()
+        self.chunks.put(None)
+        self.writer.join()
+        self.header['frames'] = self.frames
+        self.header['score'] = score
+        self.file.seek(0)
+        self.file.write(self.header.tobytes())
+        self.file.close()
+
+class InputLog:
+    # a recorded log, memory mapped so frames are read on demand
+    def __init__(self, path: str):
+        self.path = path
+        self.header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if self.header['magic'] != MAGIC or self.header['version'] != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} input log')
+        # a log that was never closed still has every whole frame the writer got to
+        num_frames = (os.path.getsize(path) - HEADER_DTYPE.itemsize) // FRAME_DTYPE.itemsize
+        if num_frames > 0:
+            self.frames = np.memmap(path, dtype=FRAME_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize,
+                                    shape=(num_frames,))
+        else:
+            self.frames = np.zeros(0, dtype=FRAME_DTYPE)
+
+    def __len__(self) -> int:
+        return self.frames.shape[0]
+
+    def __getitem__(self, frame: int) -> np.void:
+        return self.frames[frame]
+
+    def is_complete(self) -> bool:
+        return int(self.header['frames']) == len(self)
+
+class PlaybackInput:
+    # input source that replays a log, one frame per get_events call. leaps come back as mouse clicks
+    def __init__(self, log: InputLog, start_frame: int = 0):
+        self.log = log
+        self.frame = start_frame - 1
+        self.current = None
+
+    def done(self) -> bool:
+        return self.frame + 1 >= len(self.log)
+
+    def get_events(self) -> list[pg.Event]:
+        self.frame += 1
+        self.current = self.log[self.frame]
+        mouse_pos = self.get_mouse_pos()
+        return [pg.event.Event(pg.MOUSEBUTTONUP, button=1, pos=mouse_pos)
+                for i in range(int(self.current['leaps']))]
+
+    def get_mouse_pos(self) -> tuple[float, float]:
+        return tuple(int(coord) for coord in self.current['mouse'])
@@ -0,0 +1,31 @@
+import pygame as pg
+
+class PygameInput:
+    # live input from the window
+    def __init__(self, frame_timer=None):
+        self.frame_timer = frame_timer
+
+    def get_events(self) -> list[pg.Event]:
+        if self.frame_timer is None:
+            return pg.event.get()
+        with self.frame_timer.phase('events'):
+            return pg.event.get()
+
+    def get_mouse_pos(self) -> tuple[float, float]:
+        return pg.mouse.get_pos()
+
+class ScriptedInput:
+    # input from a script, script(frame) returns the frame's (events, mouse_pos)
+    def __init__(self, script: callable):
+        self.script = script
+        self.frame = -1
+        self.mouse_pos = (0, 0)
+
+    def get_events(self) -> list[pg.Event]:
+        # each call starts a new frame
+        self.frame += 1
+        events, self.mouse_pos = self.script(self.frame)
+        return events
+
+    def get_mouse_pos(self) -> tuple[float, float]:
+        return self.mouse_pos
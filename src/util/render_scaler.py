@@ -0,0 +1,37 @@
+import numpy as np
+
+# frames averaged between two decisions
+SAMPLE_FRAMES = 30
+SCALE_STEP = 0.125
+MIN_SCALE = 0.5
+# the scale only goes back up when the frame is expected to stay under this share of the budget
+HEADROOM = 0.8
+
+class RenderScaler:
+    # picks the render scale from recent frame times, lowering it while frames run over budget and
+    # raising it again once there is room. the cost of a frame is taken to grow with the pixel count
+    def __init__(self, budget: float, scale: float = 1.0, min_scale: float = MIN_SCALE,
+                 max_scale: float = 1.0, sample_frames: int = SAMPLE_FRAMES):
+        self.budget = budget
+        self.scale = scale
+        self.min_scale = min(min_scale, max_scale)
+        self.max_scale = max_scale
+        self.samples = np.zeros(sample_frames, dtype=np.float64)
+        self.count = 0
+
+    def add_frame(self, frame_time: float) -> float:
+        # the scale to draw the next frame at
+        self.samples[self.count] = frame_time
+        self.count += 1
+        if self.count < self.samples.shape[0]:
+            return self.scale
+        self.count = 0
+        # the median, so a single hitch does not cost resolution
+        frame_time = float(np.median(self.samples))
+        if frame_time > self.budget:
+            self.scale = max(self.scale - SCALE_STEP, self.min_scale)
+        else:
+            scale = min(self.scale + SCALE_STEP, self.max_scale)
+            if frame_time * (scale / self.scale) ** 2 < self.budget * HEADROOM:
+                self.scale = scale
+        return self.scale
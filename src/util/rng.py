@@ -0,0 +1,27 @@
+import numpy as np
+
+# every subsystem draws from its own stream, so e.g. a change to how many sparks a kill makes
+# does not shift where the next enemy spawns
+STREAMS = ('enemies', 'particles', 'shake', 'cursor')
+
+class RandomService:
+    def __init__(self, seed: int = None):
+        self.reseed(seed)
+
+    def reseed(self, seed: int = None):
+        # one child sequence per stream, independent of each other and of the order they are used in
+        self.seed = seed
+        children = np.random.SeedSequence(seed).spawn(len(STREAMS))
+        self.streams = {name: np.random.default_rng(child) for name, child in zip(STREAMS, children)}
+
+    def get_stream(self, name: str) -> np.random.Generator:
+        return self.streams[name]
+
+_service = RandomService()
+
+def reseed(seed: int = None):
+    _service.reseed(seed)
+
+def get_stream(name: str) -> np.random.Generator:
+    # look the stream up at every draw, reseeding replaces the generators
+    return _service.get_stream(name)
@@ -0,0 +1,57 @@
+import pygame as pg
+from collections import OrderedDict
+
+# glow radii are rounded to this many pixels so particles that shrink every frame share sprites.
+# spark glows top out near 40 px, at 4 px a kill burst builds 9 glows instead of 36 at 1 px
+GLOW_STEP = 4
+# least recently used glows are dropped past this many bytes of surfaces
+GLOW_CACHE_BYTES = 8 * 1024 * 1024
+
+# pre-rendered sprites shared by every entity, keyed by (radius, color)
+_circles : dict[tuple[float, tuple[int, int, int]], pg.Surface] = {}
+# glows, keyed by (quantized radius, color) in least to most recently used order
+_glows : OrderedDict[tuple[float, tuple[int, int, int]], pg.Surface] = OrderedDict()
+_glow_bytes = 0
+
+def draw_circle(radius: float, color: tuple[int, int, int]) -> pg.Surface:
+    surf = pg.Surface((2*radius, 2*radius))
+    pg.draw.circle(surf, color, (radius, radius), radius)
+    surf.set_colorkey((0, 0, 0))
+    return surf
+
+def get_circle(radius: float, color: tuple[int, int, int]) -> pg.Surface:
+    # the returned surface is shared, callers must never draw onto it
+    key = (radius, tuple(color))
+    surf = _circles.get(key)
+    if surf is None:
+        surf = draw_circle(radius, color)
+        _circles[key] = surf
+    return surf
+
+def quantize_radius(radius: float) -> float:
+    return max(round(radius / GLOW_STEP), 1) * GLOW_STEP
+
+def get_glow(radius: float, color: tuple[int, int, int]) -> pg.Surface:
+    # a circle of quantize_radius(radius), callers should place it by that radius
+    global _glow_bytes
+    key = (quantize_radius(radius), tuple(color))
+    surf = _glows.get(key)
+    if surf is not None:
+        _glows.move_to_end(key)
+        return surf
+    surf = draw_circle(key[0], color)
+    _glows[key] = surf
+    _glow_bytes += get_size(surf)
+    while _glow_bytes > GLOW_CACHE_BYTES and len(_glows) > 1:
+        _, evicted = _glows.popitem(last=False)
+        _glow_bytes -= get_size(evicted)
+    return surf
+
+def get_size(surf: pg.Surface) -> int:
+    return surf.get_pitch() * surf.get_height()
+
+def clear_cache():
+    global _glow_bytes
+    _circles.clear()
+    _glows.clear()
+    _glow_bytes = 0
@@ -0,0 +1,34 @@
+import pytest
+
+from src.game import FRAME_PHASES, FRAME_BUDGET, SCALER_EXCLUDE
+from src.util.frame_timer import FrameTimer
+from src.util.render_scaler import RenderScaler, SAMPLE_FRAMES
+
+def run_frames(scaler: RenderScaler, phase_times: dict[str, float], frames: int = 8 * SAMPLE_FRAMES) -> float:
+    # frames that spend phase_times in their phases, fed to scaler like Game.update_render_scale does
+    frame_timer = FrameTimer(FRAME_PHASES)
+    scale = scaler.scale
+    for i in range(frames):
+        for phase, seconds in phase_times.items():
+            frame_timer.samples[frame_timer.frame, frame_timer.phase_index[phase]] = seconds
+        frame_timer.end_frame()
+        scale = scaler.add_frame(frame_timer.get_last_frame(exclude=SCALER_EXCLUDE))
+    return scale
+
+def vsync_bound(work: float) -> dict[str, float]:
+    # the flip waits out whatever the frame left of the refresh, plus a little wakeup latency
+    return {'update': work / 2, 'render': work / 2, 'flip': FRAME_BUDGET - work + 0.001}
+
+def test_vsync_wait_does_not_lower_scale():
+    assert run_frames(RenderScaler(FRAME_BUDGET), vsync_bound(0.004)) == 1.0
+
+def test_vsync_wait_does_not_stop_scale_recovering():
+    assert run_frames(RenderScaler(FRAME_BUDGET, scale=0.5), vsync_bound(0.004)) == 1.0
+
+def test_clock_wait_does_not_lower_scale():
+    assert run_frames(RenderScaler(FRAME_BUDGET), {'render': 0.004, 'tick': 0.02}) == 1.0
+
+@pytest.mark.parametrize('work', [0.02, 0.04])
+def test_over_budget_lowers_scale(work: float):
+    scaler = RenderScaler(FRAME_BUDGET)
+    assert run_frames(scaler, {'update': work / 2, 'render': work / 2, 'flip': 0.001}) == scaler.min_scale
@@ -0,0 +1,39 @@
+import pygame as pg
+import numpy as np
+import pytest
+
+from src.entities.entity import swept_aabb_coll, swept_aabb_colls
+
+def get_rows(rects: list[pg.Rect]) -> 'np.ndarray[np.int64]':
+    return np.array([(rect.left, rect.top, rect.right, rect.bottom) for rect in rects], dtype=np.int64)
+
+def check(movement: tuple[float, float], r1: pg.Rect, rects: list[pg.Rect]):
+    expected = np.array([swept_aabb_coll(movement, r1, r2) for r2 in rects], dtype=bool)
+    np.testing.assert_array_equal(swept_aabb_colls(movement, r1, get_rows(rects)), expected)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random(seed: int):
+    rng = np.random.default_rng(seed)
+    r1 = pg.Rect(*rng.integers(-50, 50, 2), *rng.integers(1, 30, 2))
+    rects = [pg.Rect(*rng.integers(-100, 100, 2), *rng.integers(1, 30, 2)) for i in range(200)]
+    for movement in rng.uniform(-150, 150, (20, 2)):
+        check(tuple(movement), r1, rects)
+    # whole pixel movement lands exactly on edges
+    for movement in rng.integers(-150, 150, (20, 2)):
+        check(tuple(float(coord) for coord in movement), r1, rects)
+
+@pytest.mark.parametrize('movement', [(0, 0), (0, 40), (0, -40), (40, 0), (-40, 0)])
+def test_zero_movement(movement: tuple[float, float]):
+    rng = np.random.default_rng(0)
+    r1 = pg.Rect(0, 0, 10, 10)
+    rects = [pg.Rect(*rng.integers(-60, 60, 2), *rng.integers(1, 30, 2)) for i in range(500)]
+    check(movement, r1, rects)
+
+@pytest.mark.parametrize('movement', [(10, 0), (-10, 0), (0, 10), (0, -10), (10, 10), (-10, -10), (0, 0)])
+def test_touching_edges(movement: tuple[float, float]):
+    r1 = pg.Rect(0, 0, 10, 10)
+    rects = [
+        pg.Rect(10, 0, 10, 10), pg.Rect(-10, 0, 10, 10), pg.Rect(0, 10, 10, 10), pg.Rect(0, -10, 10, 10),
+        pg.Rect(10, 10, 10, 10), pg.Rect(-10, -10, 10, 10), pg.Rect(20, 0, 10, 10), pg.Rect(0, 0, 10, 10),
+    ]
+    check(movement, r1, rects)